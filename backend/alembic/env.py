@@ -12,6 +12,8 @@ from app.core.database import Base
 from app.core.config import settings
 from app.models.user import User
 from app.models.csv_file import CSVFile
+from app.models.csv_blob import CSVBlob
+from app.models.csv_search_term import CSVSearchTerm
 
 # this is the Alembic Config object
 config = context.config
@@ -0,0 +1,33 @@
+"""add_csv_metadata_columns
+
+Revision ID: 7d2e5a9c4b1f
+Revises: c613dd523017
+Create Date: 2026-10-17 09:12:44.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2e5a9c4b1f'
+down_revision = 'c613dd523017'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Nullable so existing files fall back to scanning on view
+    op.add_column('csv_files', sa.Column('headers', sa.JSON(), nullable=True))
+    op.add_column('csv_files', sa.Column('delimiter', sa.String(length=1), nullable=True))
+    op.add_column('csv_files', sa.Column('encoding', sa.String(), nullable=True))
+    op.add_column('csv_files', sa.Column('row_count', sa.Integer(), nullable=True))
+    op.add_column('csv_files', sa.Column('data_offset', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('csv_files', 'data_offset')
+    op.drop_column('csv_files', 'row_count')
+    op.drop_column('csv_files', 'encoding')
+    op.drop_column('csv_files', 'delimiter')
+    op.drop_column('csv_files', 'headers')
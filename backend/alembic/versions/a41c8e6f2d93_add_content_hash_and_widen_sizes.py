@@ -0,0 +1,30 @@
+"""add_content_hash_and_widen_sizes
+
+Revision ID: a41c8e6f2d93
+Revises: 7d2e5a9c4b1f
+Create Date: 2026-10-17 11:03:27.904512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41c8e6f2d93'
+down_revision = '7d2e5a9c4b1f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('csv_files', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    
+    # Streaming uploads allow files past the 2 GB range of INTEGER
+    op.alter_column('csv_files', 'file_size', type_=sa.BigInteger(), existing_nullable=False)
+    op.alter_column('csv_files', 'data_offset', type_=sa.BigInteger(), existing_nullable=True)
+
+
+def downgrade() -> None:
+    op.alter_column('csv_files', 'data_offset', type_=sa.Integer(), existing_nullable=True)
+    op.alter_column('csv_files', 'file_size', type_=sa.Integer(), existing_nullable=False)
+    op.drop_column('csv_files', 'content_hash')
@@ -0,0 +1,26 @@
+"""add_csv_files_keyset_index
+
+Revision ID: b7f19d3e6a20
+Revises: a41c8e6f2d93
+Create Date: 2026-10-17 13:41:09.227361
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7f19d3e6a20'
+down_revision = 'a41c8e6f2d93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Supports ORDER BY uploaded_at DESC, id DESC and the row-value seek
+    # used by cursor pagination on /csv/list
+    op.create_index('ix_csv_files_uploaded_at_id', 'csv_files', ['uploaded_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_csv_files_uploaded_at_id', table_name='csv_files')
@@ -0,0 +1,25 @@
+"""add_csv_files_compression
+
+Revision ID: d52a8f1c7e34
+Revises: b7f19d3e6a20
+Create Date: 2026-10-17 15:02:47.513820
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd52a8f1c7e34'
+down_revision = 'b7f19d3e6a20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # NULL means the file is stored uncompressed (all existing uploads)
+    op.add_column('csv_files', sa.Column('compression', sa.String(length=16), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('csv_files', 'compression')
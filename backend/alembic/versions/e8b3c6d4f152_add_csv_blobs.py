@@ -0,0 +1,45 @@
+"""add_csv_blobs
+
+Revision ID: e8b3c6d4f152
+Revises: d52a8f1c7e34
+Create Date: 2026-10-17 16:20:05.318442
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b3c6d4f152'
+down_revision = 'd52a8f1c7e34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'csv_blobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('file_path', sa.String(), nullable=False),
+        sa.Column('compression', sa.String(length=16), nullable=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('content_hash')
+    )
+    op.create_index(op.f('ix_csv_blobs_id'), 'csv_blobs', ['id'], unique=False)
+    # Existing files keep a NULL blob_id and continue to own their file
+    op.add_column('csv_files', sa.Column('blob_id', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_csv_files_blob_id'), 'csv_files', ['blob_id'], unique=False)
+    op.create_foreign_key(
+        'fk_csv_files_blob_id_csv_blobs', 'csv_files', 'csv_blobs', ['blob_id'], ['id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('fk_csv_files_blob_id_csv_blobs', 'csv_files', type_='foreignkey')
+    op.drop_index(op.f('ix_csv_files_blob_id'), table_name='csv_files')
+    op.drop_column('csv_files', 'blob_id')
+    op.drop_index(op.f('ix_csv_blobs_id'), table_name='csv_blobs')
+    op.drop_table('csv_blobs')
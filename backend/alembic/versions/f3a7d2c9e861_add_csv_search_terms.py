@@ -0,0 +1,35 @@
+"""add_csv_search_terms
+
+Revision ID: f3a7d2c9e861
+Revises: e8b3c6d4f152
+Create Date: 2026-10-17 19:02:41.580317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a7d2c9e861'
+down_revision = 'e8b3c6d4f152'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'csv_search_terms',
+        sa.Column('term_hash', sa.BigInteger(), nullable=False),
+        sa.Column('blob_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['blob_id'], ['csv_blobs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('term_hash', 'blob_id')
+    )
+    op.create_index('ix_csv_search_terms_blob_id', 'csv_search_terms', ['blob_id'], unique=False)
+    # Existing blobs stay unindexed until reindex_search.py is run
+    op.add_column('csv_blobs', sa.Column('search_indexed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('csv_blobs', 'search_indexed_at')
+    op.drop_index('ix_csv_search_terms_blob_id', table_name='csv_search_terms')
+    op.drop_table('csv_search_terms')
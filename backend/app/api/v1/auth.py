@@ -1,6 +1,6 @@
 """Authentication endpoints."""
 from fastapi import APIRouter, Depends, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from app.core.database import get_db
 from app.core.dependencies import get_current_user, get_current_admin_user
@@ -26,11 +26,11 @@ router = APIRouter()
 async def signup(
     user_data: UserCreate,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> UserResponse:
     """Register a new user (admin only)."""
     role = user_data.role if user_data.role else UserRole.USER
-    new_user = UserService.create_user(
+    new_user = await UserService.create_user(
         db=db,
         username=user_data.username,
         email=user_data.email,
@@ -48,10 +48,10 @@ async def signup(
 )
 async def login(
     user_data: UserLogin,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Token:
     """Authenticate user by email and return JWT token."""
-    user = UserService.authenticate(db, user_data.email, user_data.password)
+    user = await UserService.authenticate(db, user_data.email, user_data.password)
     if not user:
         logger.warning(f"Failed login attempt for email: {user_data.email}")
         raise UnauthorizedError("Incorrect email or password")
@@ -1,18 +1,36 @@
 """CSV file management endpoints."""
-from fastapi import APIRouter, Depends, File, UploadFile, status, Query
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from typing import List
-from pathlib import Path
+from fastapi import APIRouter, Depends, File, UploadFile, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import datetime
 from app.core.database import get_db
 from app.core.dependencies import get_current_user, get_current_admin_user
 from app.core.exceptions import NotFoundError
+from app.core.config import settings
+from app.core.executor import run_blocking
 from app.models.user import User
-from app.schemas.csv import CSVFileResponse, CSVViewResponse
+from app.schemas.csv import (
+    CSVFileResponse,
+    CSVViewResponse,
+    CSVStatsResponse,
+    CSVSearchResponse,
+    CSVSQLQueryRequest,
+    CSVDownloadURLResponse,
+)
 from app.services.csv_service import CSVService
-from app.utils.csv_parser import parse_csv_file
+from app.services.search_service import SearchService
+from app.services.sql_service import SQLService
+from app.utils.csv_query import RowQuery
+from app.storage import storage
+from app.utils.file_response import (
+    accepts_encoding,
+    decoded_download_response,
+    file_download_response,
+)
 from app.utils.logger import logger
-from app.websocket.manager import manager
+from app.utils.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
+from app.websocket.event_bus import event_bus
 
 router = APIRouter()
 
@@ -27,13 +45,13 @@ router = APIRouter()
 async def upload_csv(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> CSVFileResponse:
     """Upload a CSV file."""
-    csv_file = CSVService.upload_file(db, file, current_user)
+    csv_file = await CSVService.upload_file(db, file, current_user)
     
-    # Broadcast update via WebSocket
-    await manager.broadcast({
+    # Broadcast update via WebSocket on every worker
+    await event_bus.publish({
         "event": "csv_list_updated",
         "action": "uploaded",
         "file": {
@@ -41,8 +59,9 @@ async def upload_csv(
             "filename": csv_file.filename,
             "file_size": csv_file.file_size,
             "uploader_id": csv_file.uploader_id,
-            "uploader_username": csv_file.uploader.username,
-            "uploaded_at": csv_file.uploaded_at.isoformat()
+            "uploader_username": current_user.username,
+            "uploaded_at": csv_file.uploaded_at.isoformat(),
+            "row_count": csv_file.row_count
         }
     })
     
@@ -51,8 +70,9 @@ async def upload_csv(
         filename=csv_file.filename,
         file_size=csv_file.file_size,
         uploader_id=csv_file.uploader_id,
-        uploader_username=csv_file.uploader.username,
-        uploaded_at=csv_file.uploaded_at
+        uploader_username=current_user.username,
+        uploaded_at=csv_file.uploaded_at,
+        row_count=csv_file.row_count
     )
 
 
@@ -60,83 +80,239 @@ async def upload_csv(
     "/list",
     response_model=List[CSVFileResponse],
     summary="List CSV files",
-    description="Get a list of all uploaded CSV files"
+    description=(
+        "Get a list of all uploaded CSV files. When a full page is returned, "
+        f"the {NEXT_CURSOR_HEADER} response header holds a cursor for the next page."
+    )
 )
 async def list_csvs(
+    response: Response,
     skip: int = Query(0, ge=0, description="Number of records to skip"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of records to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page (overrides skip)"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> List[CSVFileResponse]:
     """List all CSV files."""
-    csv_files = CSVService.get_all(db, skip=skip, limit=limit)
-    return [
-        CSVFileResponse(
-            id=file.id,
-            filename=file.filename,
-            file_size=file.file_size,
-            uploader_id=file.uploader_id,
-            uploader_username=file.uploader.username,
-            uploaded_at=file.uploaded_at
-        )
-        for file in csv_files
-    ]
+    after = decode_cursor(cursor, datetime, int) if cursor else None
+    rows = await CSVService.get_all(db, skip=skip, limit=limit, after=after)
+    if len(rows) == limit:
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.uploaded_at, last.id)
+    return [CSVFileResponse.model_validate(row) for row in rows]
+
+
+@router.get(
+    "/search",
+    response_model=CSVSearchResponse,
+    summary="Search CSV files",
+    description=(
+        "Find the files, and the rows within them, containing every term of "
+        "the query (case-insensitive whole words). Answered from the search "
+        "index without reading the files; newest files first."
+    )
+)
+async def search_csvs(
+    q: str = Query(..., min_length=1, max_length=1000, description="Terms to search for"),
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of files to return"),
+    max_positions: int = Query(20, ge=0, le=1000, description="Maximum row numbers per file"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+) -> CSVSearchResponse:
+    """Search the contents of all CSV files."""
+    found = await SearchService.search(db, q, limit=limit, max_positions=max_positions)
+    return CSVSearchResponse(query=q, **found)
+
+
+@router.post(
+    "/query",
+    summary="Query CSV files with SQL",
+    description=(
+        "Run a read-only SQL SELECT over one or more CSV files, each exposed "
+        "under a table name of your choice, and stream the result as CSV. "
+        f"Queries are stopped after {settings.sql_timeout_seconds:g} seconds."
+    ),
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/csv": {}}}}
+)
+async def query_csvs(
+    query: CSVSQLQueryRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+) -> StreamingResponse:
+    """Run a SQL query over CSV files."""
+    chunks = await SQLService.query_csv(db, query.sql, query.tables)
+    return StreamingResponse(chunks, media_type="text/csv")
 
 
 @router.get(
     "/{file_id}/view",
     response_model=CSVViewResponse,
     summary="View CSV file",
-    description="View the contents of a CSV file"
+    description=(
+        "View the contents of a CSV file, optionally projected to some "
+        "columns, filtered and sorted on the server"
+    )
 )
 async def view_csv(
     file_id: int,
     max_rows: int = Query(100, ge=1, le=1000, description="Maximum rows to return"),
+    offset: int = Query(0, ge=0, description="Index of the first row to return (at most 10000 when sorting)"),
+    columns: Optional[List[str]] = Query(
+        None, description="Column to return (repeatable, in order); all by default"
+    ),
+    filters: Optional[List[str]] = Query(
+        None,
+        alias="filter",
+        description=(
+            "Predicate as column:operator:value (repeatable; all must hold). "
+            "Operators: eq, ne, lt, lte, gt, gte, contains"
+        ),
+    ),
+    sort: Optional[List[str]] = Query(
+        None, description="Column to sort by, prefixed with - for descending (repeatable)"
+    ),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> CSVViewResponse:
     """View CSV file contents."""
-    csv_file = CSVService.get_by_id(db, file_id)
+    query = RowQuery.parse(columns=columns, filters=filters, sort=sort)
+    csv_file = await CSVService.get_by_id(db, file_id)
     if not csv_file:
         raise NotFoundError("CSV file", str(file_id))
     
-    # Parse CSV file
-    file_path = Path(csv_file.file_path)
-    parsed_data = parse_csv_file(file_path, max_rows=max_rows)
+    parsed_data = await run_blocking(
+        CSVService.read_rows, csv_file, max_rows=max_rows, offset=offset, query=query
+    )
     
     return CSVViewResponse(
         filename=parsed_data["filename"],
         headers=parsed_data["headers"],
         rows=parsed_data["rows"],
         total_rows=parsed_data["total_rows"],
-        displayed_rows=len(parsed_data["rows"])
+        displayed_rows=len(parsed_data["rows"]),
+        offset=offset
     )
 
 
+@router.get(
+    "/{file_id}/stats",
+    response_model=CSVStatsResponse,
+    summary="Get column statistics",
+    description=(
+        "Get per-column type, null count, distinct-count estimate, min/max, "
+        "mean and quantiles. Computed once in the background after upload; "
+        "status is 'pending' until then."
+    )
+)
+async def get_csv_stats(
+    file_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+) -> CSVStatsResponse:
+    """Get the stored column statistics of a CSV file."""
+    csv_file = await CSVService.get_by_id(db, file_id)
+    if not csv_file:
+        raise NotFoundError("CSV file", str(file_id))
+    
+    stats = await run_blocking(CSVService.get_stats, csv_file)
+    return CSVStatsResponse(file_id=csv_file.id, filename=csv_file.filename, **stats)
+
+
 @router.get(
     "/{file_id}/download",
     summary="Download CSV file",
-    description="Download a CSV file (all authenticated users)"
+    description=(
+        "Download a CSV file (all authenticated users). Supports Range, "
+        "If-Range, If-None-Match and If-Modified-Since."
+    )
 )
 async def download_csv(
     file_id: int,
+    request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-) -> FileResponse:
-    """Download a CSV file."""
-    csv_file = CSVService.get_by_id(db, file_id)
+    db: AsyncSession = Depends(get_db)
+) -> Response:
+    """
+    Download a CSV file, or the requested byte range of it.
+    
+    Compressed files are sent exactly as stored, with Content-Encoding, to
+    clients that accept it, and decompressed on the fly otherwise.
+    """
+    csv_file = await CSVService.get_by_id(db, file_id)
     if not csv_file:
         raise NotFoundError("CSV file", str(file_id))
     
-    file_path = Path(csv_file.file_path)
-    if not file_path.exists():
+    file_key = csv_file.file_path
+    try:
+        if csv_file.compression is None:
+            return await file_download_response(
+                request,
+                key=file_key,
+                filename=csv_file.filename,
+                etag=CSVService.get_etag(csv_file),
+                last_modified=csv_file.uploaded_at,
+            )
+        
+        vary = {"Vary": "Accept-Encoding"}
+        if accepts_encoding(request, csv_file.compression):
+            return await file_download_response(
+                request,
+                key=file_key,
+                filename=csv_file.filename,
+                etag=CSVService.get_etag(csv_file, csv_file.compression),
+                last_modified=csv_file.uploaded_at,
+                extra_headers={"Content-Encoding": csv_file.compression, **vary},
+            )
+        return await decoded_download_response(
+            request,
+            key=file_key,
+            filename=csv_file.filename,
+            compression=csv_file.compression,
+            size=csv_file.file_size,
+            etag=CSVService.get_etag(csv_file),
+            last_modified=csv_file.uploaded_at,
+            extra_headers=vary,
+        )
+    except FileNotFoundError:
+        raise NotFoundError("CSV file", str(file_id))
+
+
+@router.get(
+    "/{file_id}/download-url",
+    response_model=CSVDownloadURLResponse,
+    summary="Get a direct download URL",
+    description=(
+        "Get a time-limited URL to download a CSV file straight from object "
+        "storage (all authenticated users). The URL is null when the storage "
+        "backend cannot serve clients itself; use the download endpoint then."
+    )
+)
+async def get_download_url(
+    file_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+) -> CSVDownloadURLResponse:
+    """Get a presigned URL for a CSV file, so the API does not proxy its bytes."""
+    csv_file = await CSVService.get_by_id(db, file_id)
+    if not csv_file:
         raise NotFoundError("CSV file", str(file_id))
     
-    return FileResponse(
-        path=file_path,
-        filename=csv_file.filename,
-        media_type="text/csv"
+    # Object storage cannot decompress, so such clients go through the API
+    if csv_file.compression is not None and not accepts_encoding(request, csv_file.compression):
+        return CSVDownloadURLResponse()
+    
+    url = await run_blocking(
+        storage.presigned_url,
+        csv_file.file_path,
+        csv_file.filename,
+        "text/csv",
+        csv_file.compression,
     )
+    if url is None:
+        return CSVDownloadURLResponse()
+    return CSVDownloadURLResponse(url=url, expires_in=settings.storage_presign_expiry_seconds)
 
 
 @router.delete(
@@ -148,15 +324,15 @@ async def download_csv(
 async def delete_csv(
     file_id: int,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> None:
     """Delete a CSV file."""
-    success = CSVService.delete_file(db, file_id)
+    success = await CSVService.delete_file(db, file_id)
     if not success:
         raise NotFoundError("CSV file", str(file_id))
     
-    # Broadcast update via WebSocket
-    await manager.broadcast({
+    # Broadcast update via WebSocket on every worker
+    await event_bus.publish({
         "event": "csv_list_updated",
         "action": "deleted",
         "file_id": file_id
@@ -0,0 +1,42 @@
+"""Runtime metrics endpoints."""
+from typing import Any, Dict
+from fastapi import APIRouter, Depends, Query
+from app.core.dependencies import get_current_admin_user
+from app.core.security import token_cache
+from app.models.user import User
+from app.services.user_service import user_cache
+from app.websocket.manager import manager
+
+router = APIRouter()
+
+
+@router.get(
+    "/",
+    summary="Runtime metrics",
+    description="Cache counters for this worker process (admin only)"
+)
+async def get_metrics(
+    current_user: User = Depends(get_current_admin_user)
+) -> Dict[str, Any]:
+    """Get runtime metrics for this worker."""
+    return {
+        "auth_user_cache": user_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "websocket": manager.stats(),
+    }
+
+
+@router.get(
+    "/websocket",
+    summary="WebSocket metrics",
+    description="Fan-out counters and per-connection details for this worker (admin only)"
+)
+async def get_websocket_metrics(
+    limit: int = Query(100, ge=1, le=10000, description="Maximum connections to describe"),
+    current_user: User = Depends(get_current_admin_user)
+) -> Dict[str, Any]:
+    """Get WebSocket fan-out metrics, listing the most backed-up connections first."""
+    return {
+        **manager.stats(),
+        "clients": manager.describe_connections(limit=limit),
+    }
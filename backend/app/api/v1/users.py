@@ -1,7 +1,7 @@
 """User management endpoints."""
-from fastapi import APIRouter, Depends, status, Query
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, status, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from app.core.database import get_db
 from app.core.dependencies import get_current_admin_user
 from app.core.exceptions import BadRequestError, NotFoundError
@@ -9,6 +9,7 @@ from app.models.user import User
 from app.schemas.auth import UserResponse, UserUpdate
 from app.services.user_service import UserService
 from app.utils.logger import logger
+from app.utils.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
 
 router = APIRouter()
 
@@ -17,16 +18,24 @@ router = APIRouter()
     "/",
     response_model=List[UserResponse],
     summary="List users",
-    description="Get a list of all registered users (admin only)"
+    description=(
+        "Get a list of all registered users (admin only). When a full page is "
+        f"returned, the {NEXT_CURSOR_HEADER} response header holds a cursor for the next page."
+    )
 )
 async def list_users(
+    response: Response,
     skip: int = Query(0, ge=0, description="Number of records to skip"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of records to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page (overrides skip)"),
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> List[UserResponse]:
     """List all users."""
-    users = UserService.get_all_users(db, skip=skip, limit=limit)
+    after_id = decode_cursor(cursor, int)[0] if cursor else None
+    users = await UserService.get_all_users(db, skip=skip, limit=limit, after_id=after_id)
+    if len(users) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(users[-1].id)
     return users
 
 
@@ -40,10 +49,10 @@ async def update_user(
     user_id: int,
     user_data: UserUpdate,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> UserResponse:
     """Update a user."""
-    updated_user = UserService.update_user(
+    updated_user = await UserService.update_user(
         db=db,
         user_id=user_id,
         username=user_data.username,
@@ -67,13 +76,13 @@ async def update_user(
 async def delete_user(
     user_id: int,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> None:
     """Delete a user."""
     if user_id == current_user.id:
         raise BadRequestError("Cannot delete your own account")
     
-    success = UserService.delete_user(db, user_id)
+    success = await UserService.delete_user(db, user_id)
     if not success:
         raise NotFoundError("User", str(user_id))
 
@@ -1,26 +1,114 @@
 """WebSocket endpoints."""
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from app.websocket.manager import manager
+import asyncio
+import json
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.security import decode_access_token
+from app.models.user import User
+from app.services.user_service import UserService
+from app.websocket.manager import manager, is_valid_topic
 from app.utils.logger import logger
 
 router = APIRouter()
 
 
+async def _authenticate(websocket: WebSocket) -> Optional[User]:
+    """
+    Authenticate a freshly accepted WebSocket.
+
+    The JWT is taken from the ``token`` query parameter or, failing that,
+    from a first message of the form ``{"type": "auth", "token": "..."}``
+    sent within settings.ws_auth_timeout_seconds.
+    """
+    token = websocket.query_params.get("token")
+    if not token:
+        try:
+            data = await asyncio.wait_for(
+                websocket.receive_text(), timeout=settings.ws_auth_timeout_seconds
+            )
+            message = json.loads(data)
+        except (asyncio.TimeoutError, ValueError):
+            return None
+        if isinstance(message, dict) and message.get("type") == "auth":
+            token = message.get("token")
+    if not isinstance(token, str) or not token:
+        return None
+
+    try:
+        email = decode_access_token(token).get("sub")
+    except ValueError:
+        return None
+    if email is None:
+        return None
+    async with AsyncSessionLocal() as db:
+        return await UserService.get_authenticated_user(db, email)
+
+
+def _parse_topics(message: Dict[str, Any]) -> List[str]:
+    topics = message.get("topics")
+    if not isinstance(topics, list) or not all(is_valid_topic(t) for t in topics):
+        raise ValueError("topics must be a list of 'csv', 'csv:<action>' or 'csv:file:<id>'")
+    return topics
+
+
 @router.websocket("/csv-updates")
 async def websocket_endpoint(websocket: WebSocket) -> None:
-    """WebSocket endpoint for real-time CSV updates."""
-    await manager.connect(websocket)
+    """
+    WebSocket endpoint for real-time CSV updates.
+
+    Clients must authenticate before they are registered. They receive
+    every CSV event by default and can narrow that with
+    ``{"type": "subscribe" | "unsubscribe", "topics": [...]}`` messages.
+    The server sends ``{"type": "ping"}`` every
+    settings.ws_heartbeat_interval_seconds; clients that stay silent past
+    the heartbeat timeout are reaped. Any message counts as a sign of
+    life, and anything unrecognized is answered with a pong.
+    """
+    await websocket.accept()
+    try:
+        user = await _authenticate(websocket)
+    except WebSocketDisconnect:
+        return
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await manager.connect(websocket, user=user.email)
     try:
         while True:
-            # Keep connection alive and handle incoming messages
             data = await websocket.receive_text()
             logger.debug(f"Received WebSocket message: {data}")
-            # Echo back for connection health check
-            await websocket.send_json({"type": "pong", "message": "connected"})
+            manager.touch(websocket)
+            try:
+                message = json.loads(data)
+            except ValueError:
+                message = None
+
+            # Replies go through the send queue, so they are never
+            # interleaved with a broadcast
+            kind = message.get("type") if isinstance(message, dict) else None
+            if kind == "pong":
+                # Heartbeat answer; touch() above already recorded it
+                continue
+            if kind in ("subscribe", "unsubscribe"):
+                try:
+                    topics = _parse_topics(message)
+                    if kind == "subscribe":
+                        current = manager.subscribe(websocket, topics)
+                    else:
+                        current = manager.unsubscribe(websocket, topics)
+                    reply = {"type": "subscriptions", "topics": current}
+                except ValueError as e:
+                    reply = {"type": "error", "message": str(e)}
+            else:
+                # Connection health check
+                reply = {"type": "pong", "message": "connected"}
+            await manager.send_personal_message(reply, websocket)
     except WebSocketDisconnect:
         manager.disconnect(websocket)
         logger.info("WebSocket client disconnected")
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
         manager.disconnect(websocket)
-
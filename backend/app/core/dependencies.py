@@ -2,7 +2,7 @@
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
 from app.core.security import decode_access_token
 from app.core.exceptions import UnauthorizedError, ForbiddenError
@@ -15,7 +15,7 @@ security = HTTPBearer()
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> User:
     """Dependency to get the current authenticated user."""
     try:
@@ -26,7 +26,7 @@ async def get_current_user(
         if email is None:
             raise UnauthorizedError()
         
-        user = UserService.get_by_email(db, email)
+        user = await UserService.get_authenticated_user(db, email)
         if user is None:
             raise UnauthorizedError()
         
@@ -0,0 +1,57 @@
+"""Thread pools for running blocking work off the event loop."""
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, TypeVar
+from app.core.config import settings
+
+T = TypeVar("T")
+
+# Disk reads/writes and synchronous database calls
+io_executor = ThreadPoolExecutor(
+    max_workers=settings.io_thread_pool_size,
+    thread_name_prefix="io",
+)
+
+# bcrypt hashing and verification. Kept separate so a login storm queues
+# here instead of starving file I/O; bcrypt releases the GIL, so threads
+# run in parallel.
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_concurrency,
+    thread_name_prefix="bcrypt",
+)
+
+# Work nobody waits for, such as building columnar copies of uploads.
+# Small by default so conversions queue instead of competing with requests.
+background_executor = ThreadPoolExecutor(
+    max_workers=settings.background_thread_pool_size,
+    thread_name_prefix="background",
+)
+
+
+async def _run_in(executor: ThreadPoolExecutor, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking function in the I/O thread pool and await its result."""
+    return await _run_in(io_executor, func, *args, **kwargs)
+
+
+async def run_password_hashing(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a password hashing function in the bcrypt pool and await its result."""
+    return await _run_in(password_executor, func, *args, **kwargs)
+
+
+def submit_background(func: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+    """Run a blocking function in the background pool without waiting for it."""
+    return background_executor.submit(func, *args, **kwargs)
+
+
+def shutdown_executors() -> None:
+    """Stop all worker pools, waiting for in-flight work to finish."""
+    io_executor.shutdown(wait=True)
+    password_executor.shutdown(wait=True)
+    # Queued background work is dropped; it is safe to redo later
+    background_executor.shutdown(wait=True, cancel_futures=True)
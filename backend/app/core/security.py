@@ -1,9 +1,20 @@
 """Security utilities for authentication and password hashing."""
+import hashlib
+import time
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from jose import JWTError, jwt
 import bcrypt
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.executor import run_password_hashing
+
+# Verified token payloads keyed by SHA-256 of the token. Entries never
+# outlive the token's own exp claim.
+token_cache: TTLCache[bytes, Dict[str, Any]] = TTLCache(
+    maxsize=settings.token_cache_size,
+    ttl_seconds=settings.token_cache_ttl_seconds,
+)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -31,6 +42,16 @@ def get_password_hash(password: str) -> str:
     return hashed.decode('utf-8')
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password in the bcrypt pool without blocking the event loop."""
+    return await run_password_hashing(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password in the bcrypt pool without blocking the event loop."""
+    return await run_password_hashing(get_password_hash, password)
+
+
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
     to_encode = data.copy()
@@ -45,10 +66,20 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
 
 
 def decode_access_token(token: str) -> Dict[str, Any]:
-    """Decode and validate a JWT token."""
+    """Decode and validate a JWT token, reusing earlier verifications."""
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        return dict(payload)
+    
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        return payload
     except JWTError:
         raise ValueError("Invalid token")
+    
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        # Convert the wall-clock expiry into the cache's monotonic clock
+        token_cache.set(key, payload, expires_at=time.monotonic() + (exp - time.time()))
+    return dict(payload)
 
@@ -3,12 +3,12 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.database import engine, Base
-from app.api.v1 import auth, csv_files, users, websocket
+from app.core.executor import shutdown_executors
+from app.api.v1 import auth, csv_files, users, websocket, metrics
 from app.utils.logger import logger
-
-# Create database tables (in production, use migrations)
-if settings.debug:
-    Base.metadata.create_all(bind=engine)
+from app.utils.pagination import NEXT_CURSOR_HEADER
+from app.websocket.event_bus import event_bus
+from app.websocket.manager import manager
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -25,6 +25,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Include API routers
@@ -32,6 +33,7 @@ app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
 app.include_router(csv_files.router, prefix="/api/v1/csv", tags=["CSV Files"])
 app.include_router(users.router, prefix="/api/v1/users", tags=["Users"])
 app.include_router(websocket.router, prefix="/ws", tags=["WebSocket"])
+app.include_router(metrics.router, prefix="/api/v1/metrics", tags=["Metrics"])
 
 
 @app.get("/", tags=["Health"])
@@ -55,9 +57,22 @@ async def startup_event():
     """Application startup event."""
     logger.info(f"{settings.app_name} v{settings.app_version} starting up...")
     logger.info(f"Debug mode: {settings.debug}")
+    
+    # Create database tables (in production, use migrations)
+    if settings.debug:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    
+    # Fan out events from every worker to this worker's WebSocket clients
+    await event_bus.start(manager.broadcast)
+    manager.start_heartbeat()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Application shutdown event."""
     logger.info(f"{settings.app_name} shutting down...")
+    await event_bus.stop()
+    manager.stop_heartbeat()
+    shutdown_executors()
+    await engine.dispose()
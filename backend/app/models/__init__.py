@@ -1,6 +1,8 @@
 """Database models."""
 from app.models.user import User
 from app.models.csv_file import CSVFile
+from app.models.csv_blob import CSVBlob
+from app.models.csv_search_term import CSVSearchTerm
 
-__all__ = ["User", "CSVFile"]
+__all__ = ["User", "CSVFile", "CSVBlob", "CSVSearchTerm"]
 
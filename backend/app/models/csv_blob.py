@@ -0,0 +1,33 @@
+"""CSV blob model."""
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.core.database import Base
+
+# Import CSVFile here to avoid circular imports
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from app.models.csv_file import CSVFile
+
+
+class CSVBlob(Base):
+    """
+    Stored file contents, shared by every upload with the same SHA-256 digest.
+    
+    The blob is removed once ref_count (the number of CSVFile rows pointing
+    at it) drops to zero.
+    """
+    
+    __tablename__ = "csv_blobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), unique=True, nullable=False)  # SHA-256 hex digest
+    file_path = Column(String, nullable=False)
+    compression = Column(String(16), nullable=True)  # storage compression; NULL for raw bytes
+    ref_count = Column(Integer, default=1, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # When its terms were added to the search index; NULL until then
+    search_indexed_at = Column(DateTime, nullable=True)
+    
+    # Relationships
+    files = relationship("CSVFile", back_populates="blob")
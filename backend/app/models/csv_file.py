@@ -1,5 +1,5 @@
 """CSV File model."""
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -8,20 +8,37 @@ from app.core.database import Base
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from app.models.user import User
+    from app.models.csv_blob import CSVBlob
 
 
 class CSVFile(Base):
     """CSV File database model."""
     
     __tablename__ = "csv_files"
+    __table_args__ = (
+        # Keyset pagination over (uploaded_at, id)
+        Index("ix_csv_files_uploaded_at_id", "uploaded_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, nullable=False, index=True)
     file_path = Column(String, nullable=False)
-    file_size = Column(Integer, nullable=False)  # in bytes
+    # Shared content; NULL for files uploaded before deduplication, which own their file
+    blob_id = Column(Integer, ForeignKey("csv_blobs.id"), nullable=True, index=True)
+    file_size = Column(BigInteger, nullable=False)  # in bytes
+    content_hash = Column(String(64), nullable=True)  # SHA-256 hex digest
+    compression = Column(String(16), nullable=True)  # storage compression; NULL for raw bytes
     uploader_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     uploaded_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     
+    # Metadata computed once at upload time (NULL for files that could not be scanned)
+    headers = Column(JSON, nullable=True)
+    delimiter = Column(String(1), nullable=True)
+    encoding = Column(String, nullable=True)
+    row_count = Column(Integer, nullable=True)
+    data_offset = Column(BigInteger, nullable=True)  # byte offset of the first data row
+    
     # Relationships
     uploader = relationship("User", back_populates="uploaded_files")
+    blob = relationship("CSVBlob", back_populates="files")
 
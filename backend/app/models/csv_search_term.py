@@ -0,0 +1,24 @@
+"""CSV search term model."""
+from sqlalchemy import Column, Integer, BigInteger, ForeignKey, Index
+from app.core.database import Base
+
+
+class CSVSearchTerm(Base):
+    """
+    Term-to-blob level of the full-text search index.
+    
+    One row per distinct term (as its 64-bit hash, see
+    app.utils.search_index) of each indexed blob. The rows containing a
+    term are looked up in the blob's search index sidecar.
+    """
+    
+    __tablename__ = "csv_search_terms"
+    __table_args__ = (
+        # Pruning a blob's terms when it is deleted
+        Index("ix_csv_search_terms_blob_id", "blob_id"),
+    )
+
+    term_hash = Column(BigInteger, primary_key=True)
+    blob_id = Column(
+        Integer, ForeignKey("csv_blobs.id", ondelete="CASCADE"), primary_key=True
+    )
@@ -1,6 +1,16 @@
 """Pydantic schemas for request/response validation."""
 from app.schemas.auth import UserCreate, UserLogin, UserResponse, Token, TokenData
-from app.schemas.csv import CSVFileResponse, CSVFileCreate, CSVViewResponse
+from app.schemas.csv import (
+    CSVFileResponse,
+    CSVFileCreate,
+    CSVViewResponse,
+    CSVColumnStats,
+    CSVStatsResponse,
+    CSVSearchResult,
+    CSVSearchResponse,
+    CSVSQLQueryRequest,
+    CSVDownloadURLResponse,
+)
 from app.schemas.common import MessageResponse
 
 __all__ = [
@@ -12,6 +22,12 @@ __all__ = [
     "CSVFileResponse",
     "CSVFileCreate",
     "CSVViewResponse",
+    "CSVColumnStats",
+    "CSVStatsResponse",
+    "CSVSearchResult",
+    "CSVSearchResponse",
+    "CSVSQLQueryRequest",
+    "CSVDownloadURLResponse",
     "MessageResponse",
 ]
 
@@ -1,7 +1,7 @@
 """CSV-related schemas."""
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 
 class CSVFileResponse(BaseModel):
@@ -12,6 +12,7 @@ class CSVFileResponse(BaseModel):
     uploader_id: int
     uploader_username: str
     uploaded_at: datetime
+    row_count: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -30,6 +31,71 @@ class CSVViewResponse(BaseModel):
     filename: str
     headers: List[str]
     rows: List[Dict[str, Any]]
-    total_rows: int
+    total_rows: int = Field(..., description="Rows in the file, or rows matching the filters")
     displayed_rows: int = Field(..., description="Number of rows displayed (limited)")
+    offset: int = Field(0, description="Index of the first displayed row")
+
+
+class CSVColumnStats(BaseModel):
+    """Schema for one column's statistics."""
+    name: str
+    type: str = Field(..., description="integer, float, boolean, string or empty")
+    count: int = Field(..., description="Non-empty values")
+    null_count: int = Field(..., description="Empty cells")
+    distinct_estimate: int = Field(
+        ..., description="HyperLogLog estimate of distinct values (~1.6% standard error)"
+    )
+    min: Any = None
+    max: Any = None
+    mean: Optional[float] = None
+    quantiles: Optional[Dict[str, float]] = Field(
+        None, description="Approximate p1..p99 from a uniform sample of values (numeric columns)"
+    )
+
+
+class CSVStatsResponse(BaseModel):
+    """Schema for a CSV file's column statistics."""
+    file_id: int
+    filename: str
+    status: str = Field(
+        ..., description="ready, pending (being computed), failed or unavailable"
+    )
+    row_count: Optional[int] = None
+    computed_at: Optional[datetime] = None
+    columns: List[CSVColumnStats] = []
+    error: Optional[str] = None
+
+
+class CSVSearchResult(BaseModel):
+    """Schema for one file matching a search."""
+    file_id: int
+    filename: str
+    uploaded_at: datetime
+    match_count: int = Field(..., description="Rows containing every term")
+    rows: List[int] = Field(
+        ..., description="Matching row numbers (usable as the view offset), first ones only"
+    )
+
+
+class CSVSearchResponse(BaseModel):
+    """Schema for full-text search results."""
+    query: str
+    terms: List[str] = Field(..., description="Terms the query was split into")
+    results: List[CSVSearchResult]
+
+
+class CSVSQLQueryRequest(BaseModel):
+    """Schema for a read-only SQL query over CSV files."""
+    sql: str = Field(..., min_length=1, max_length=100000, description="A single SELECT statement")
+    tables: Dict[str, int] = Field(
+        ..., description="CSV file id to expose under each table name used in the query"
+    )
+
+
+class CSVDownloadURLResponse(BaseModel):
+    """Schema for a direct download URL."""
+    url: Optional[str] = Field(
+        None, description="Time-limited URL, or null to use the download endpoint"
+    )
+    expires_in: Optional[int] = Field(None, description="Seconds until the URL expires")
 
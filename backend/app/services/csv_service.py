@@ -1,17 +1,54 @@
 """CSV service for business logic."""
-from typing import List, Optional
-from sqlalchemy.orm import Session
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import Row, delete, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import UploadFile
 from pathlib import Path
 from app.models.csv_file import CSVFile
+from app.models.csv_blob import CSVBlob
+from app.models.csv_search_term import CSVSearchTerm
 from app.models.user import User
-from app.core.exceptions import NotFoundError
+from app.core.exceptions import NotFoundError, BadRequestError
 from app.utils.file_utils import (
     validate_csv_file,
     generate_unique_filename,
     get_file_path,
+    get_blob_key,
+    write_upload_chunks,
     delete_file as delete_file_util,
 )
+from app.utils.csv_parser import (
+    iter_file_chunks,
+    scan_csv_stream,
+    parse_csv_file,
+    read_csv_rows,
+)
+from app.utils.row_index import INDEX_SUFFIX, get_index_key, write_row_index, locate_row
+from app.utils.compression import (
+    GZIP,
+    GzipSeekableWriter,
+    get_storage_compression,
+    SEEK_TABLE_SUFFIX,
+    get_seek_table_key,
+    iter_stored_chunks,
+    write_seek_table,
+)
+from app.utils.columnar import (
+    build_columnar_copy,
+    columnar_enabled,
+    get_columnar_key,
+    query_columnar_rows,
+)
+from app.utils.csv_query import MAX_SORTED_OFFSET, RowQuery, query_csv_rows
+from app.utils.profiling import build_profile, claim_profile_build, get_profile_key, read_profile
+from app.utils.search_index import get_search_index_key
+from app.services.search_service import SearchService
+from app.core.config import settings
+from app.core.executor import run_blocking, submit_background
+from app.storage import storage
 from app.utils.logger import logger
 
 
@@ -19,70 +56,560 @@ class CSVService:
     """Service for CSV-related operations."""
     
     @staticmethod
-    def upload_file(
-        db: Session,
+    async def upload_file(
+        db: AsyncSession,
         file: UploadFile,
         uploader: User
     ) -> CSVFile:
-        """Upload and save a CSV file."""
+        """
+        Upload and save a CSV file.
+        
+        Contents are stored once per SHA-256 digest. The upload is streamed
+        to a staging file while it is hashed; if a blob with that digest
+        already exists it is shared and the staging file dropped, so a
+        duplicate upload costs one hashing pass and no extra disk. New
+        contents are then queued for profiling, conversion to a columnar
+        copy and search indexing.
+        """
         # Validate file
         validate_csv_file(file)
+        uploader_id, uploader_name = uploader.id, uploader.username
         
-        # Generate unique filename
-        unique_filename = generate_unique_filename(file.filename)
-        file_path = get_file_path(unique_filename)
-        
-        # Save file to disk
-        file_size = 0
-        with open(file_path, "wb") as buffer:
-            content = file.file.read()
-            file_size = len(content)
-            buffer.write(content)
+        staging_path = get_file_path(generate_unique_filename(file.filename) + ".part")
+        try:
+            staged = await run_blocking(CSVService._stage_upload, file, staging_path)
+            blob, stored, created = await CSVService._get_or_create_blob(
+                db, staging_path, staged, file.filename
+            )
+        finally:
+            await run_blocking(delete_file_util, str(staging_path))
         
         # Create database record
         csv_file = CSVFile(
             filename=file.filename,  # Store original filename
-            file_path=str(file_path),
-            file_size=file_size,
-            uploader_id=uploader.id
+            file_path=blob.file_path,
+            blob_id=blob.id,
+            uploader_id=uploader_id,
+            **stored
         )
         
         db.add(csv_file)
-        db.commit()
-        db.refresh(csv_file)
+        try:
+            await db.commit()
+        except Exception:
+            if created:
+                await run_blocking(CSVService._delete_stored, blob.file_path)
+            raise
+        await db.refresh(csv_file)
+        if created:
+            CSVService._schedule_profile(csv_file)
+            CSVService._schedule_columnar_copy(csv_file)
+            SearchService.schedule_indexing(csv_file)
         
-        logger.info(f"CSV file uploaded: {file.filename} by {uploader.username}")
+        logger.info(
+            f"CSV file uploaded: {file.filename} by {uploader_name}"
+            + ("" if created else " (duplicate contents, stored blob reused)")
+        )
         return csv_file
     
     @staticmethod
-    def get_by_id(db: Session, file_id: int) -> Optional[CSVFile]:
+    def _schedule_profile(csv_file: CSVFile) -> None:
+        """Queue the per-column profile of a stored file for background computation."""
+        if csv_file.row_count is None or not claim_profile_build(csv_file.file_path):
+            return
+        scratch_path = get_file_path(generate_unique_filename(csv_file.filename) + ".profile.part")
+        submit_background(
+            build_profile,
+            csv_file.file_path,
+            headers=csv_file.headers,
+            delimiter=csv_file.delimiter,
+            encoding=csv_file.encoding,
+            data_offset=csv_file.data_offset,
+            compression=csv_file.compression,
+            scratch_path=scratch_path
+        )
+    
+    @staticmethod
+    def _schedule_columnar_copy(csv_file: CSVFile) -> None:
+        """Queue the Parquet copy of a newly stored file for background conversion."""
+        if not csv_file.row_count or not columnar_enabled():
+            return
+        scratch_path = get_file_path(generate_unique_filename(csv_file.filename) + ".parquet.part")
+        submit_background(
+            build_columnar_copy,
+            csv_file.file_path,
+            headers=csv_file.headers,
+            delimiter=csv_file.delimiter,
+            compression=csv_file.compression,
+            data_offset=csv_file.data_offset,
+            row_count=csv_file.row_count,
+            scratch_path=scratch_path
+        )
+    
+    @staticmethod
+    def _stage_upload(file: UploadFile, staging_path: Path) -> Dict[str, Any]:
+        """
+        Stream an upload to a staging file, hashing it on the way (blocking).
+        
+        Returns:
+            Dictionary with file_size and content_hash
+        """
+        hasher = hashlib.sha256()
+        with open(staging_path, "wb") as sink:
+            for _ in write_upload_chunks(file.file, sink, hasher):
+                pass
+            file_size = sink.tell()
+        return {"file_size": file_size, "content_hash": hasher.hexdigest()}
+    
+    @staticmethod
+    async def _get_or_create_blob(
+        db: AsyncSession,
+        staging_path: Path,
+        staged: Dict[str, Any],
+        filename: str
+    ) -> Tuple[Any, Dict[str, Any], bool]:
+        """
+        Take a reference to the blob for a staged upload, creating it if needed.
+        
+        Returns:
+            Tuple of (blob with id and file_path, CSVFile column values,
+            whether the blob was created by this call)
+        """
+        content_hash = staged["content_hash"]
+        existing = await CSVService._add_blob_reference(db, content_hash)
+        if existing is None:
+            compression = get_storage_compression()
+            blob_key = get_blob_key(content_hash, ".csv.gz" if compression == GZIP else ".csv")
+            metadata = await run_blocking(
+                CSVService._store_blob, staging_path, blob_key, compression, filename
+            )
+            blob = CSVBlob(
+                content_hash=content_hash,
+                file_path=blob_key,
+                compression=compression,
+                ref_count=1
+            )
+            try:
+                async with db.begin_nested():
+                    db.add(blob)
+            except IntegrityError:
+                # A concurrent upload of the same contents created it first
+                await run_blocking(CSVService._delete_stored, blob_key)
+                existing = await CSVService._add_blob_reference(db, content_hash)
+                if existing is None:
+                    raise
+            else:
+                return blob, {**staged, **metadata}, True
+        
+        return existing, {**staged, **await CSVService._get_blob_metadata(db, existing)}, False
+    
+    @staticmethod
+    async def _add_blob_reference(db: AsyncSession, content_hash: str) -> Optional[Row]:
+        """Increment a blob's reference count, returning its id, file_path and compression."""
+        result = await db.execute(
+            update(CSVBlob)
+            .where(CSVBlob.content_hash == content_hash)
+            .values(ref_count=CSVBlob.ref_count + 1)
+            .returning(CSVBlob.id, CSVBlob.file_path, CSVBlob.compression)
+            .execution_options(synchronize_session=False)
+        )
+        return result.first()
+    
+    @staticmethod
+    async def _release_blob(db: AsyncSession, blob_id: int) -> Optional[str]:
+        """
+        Drop a reference to a blob, deleting its row and search terms when none are left.
+        
+        Returns:
+            Storage key of the blob's file if it is no longer referenced, else None
+        """
+        result = await db.execute(
+            update(CSVBlob)
+            .where(CSVBlob.id == blob_id)
+            .values(ref_count=CSVBlob.ref_count - 1)
+            .returning(CSVBlob.ref_count, CSVBlob.file_path)
+            .execution_options(synchronize_session=False)
+        )
+        row = result.first()
+        if row is None or row.ref_count > 0:
+            return None
+        await db.execute(
+            delete(CSVSearchTerm)
+            .where(CSVSearchTerm.blob_id == blob_id)
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(
+            delete(CSVBlob)
+            .where(CSVBlob.id == blob_id, CSVBlob.ref_count <= 0)
+            .execution_options(synchronize_session=False)
+        )
+        return row.file_path
+    
+    @staticmethod
+    async def _get_blob_metadata(db: AsyncSession, blob: Row) -> Dict[str, Any]:
+        """Get CSVFile metadata for an existing blob from another file sharing it."""
+        result = await db.execute(
+            select(CSVFile).where(CSVFile.blob_id == blob.id).limit(1)
+        )
+        sibling = result.scalars().first()
+        if sibling is not None:
+            return {
+                "compression": sibling.compression,
+                "headers": sibling.headers,
+                "delimiter": sibling.delimiter,
+                "encoding": sibling.encoding,
+                "row_count": sibling.row_count,
+                "data_offset": sibling.data_offset,
+            }
+        
+        # Only reachable while the blob's other uploads are still in flight
+        metadata = await run_blocking(
+            CSVService._scan_chunks,
+            iter_stored_chunks(blob.file_path, blob.compression),
+            Path(blob.file_path).name
+        )
+        return {"compression": blob.compression, **metadata}
+    
+    @staticmethod
+    def _store_blob(
+        staging_path: Path,
+        blob_key: str,
+        compression: Optional[str],
+        filename: str
+    ) -> Dict[str, Any]:
+        """
+        Move a staged upload into storage and collect its metadata (blocking).
+        
+        Headers, delimiter, row count and the row-offset index are
+        collected in the same pass that compresses the file, if enabled.
+        The file and its sidecars are built next to the staging file and
+        then handed to the storage backend.
+        
+        Returns:
+            Dictionary of CSVFile column values describing the stored file
+        """
+        local_index = Path(str(staging_path) + INDEX_SUFFIX)
+        local_seek_table = Path(str(staging_path) + SEEK_TABLE_SUFFIX)
+        local_blob = Path(str(staging_path) + ".gz") if compression == GZIP else staging_path
+        try:
+            if compression == GZIP:
+                with open(staging_path, "rb") as source, open(local_blob, "wb") as raw:
+                    sink = GzipSeekableWriter(raw)
+                    metadata = CSVService._scan_chunks(
+                        write_upload_chunks(source, sink), filename, local_index
+                    )
+                    sink.close()
+                write_seek_table(local_seek_table, sink.restart_points)
+                storage.put_file(get_seek_table_key(blob_key), local_seek_table)
+            else:
+                metadata = CSVService._scan_chunks(
+                    iter_file_chunks(staging_path), filename, local_index
+                )
+            # No index is written for files that could not be scanned
+            if local_index.exists():
+                storage.put_file(get_index_key(blob_key), local_index)
+            storage.put_file(blob_key, local_blob)
+        except Exception:
+            CSVService._delete_stored(blob_key)
+            raise
+        finally:
+            for leftover in (local_index, local_seek_table, local_blob):
+                delete_file_util(str(leftover))
+        
+        return {"compression": compression, **metadata}
+    
+    @staticmethod
+    def _scan_chunks(
+        chunks: Iterator[bytes],
+        filename: str,
+        index_path: Optional[Path] = None
+    ) -> Dict[str, Any]:
+        """
+        Scan CSV chunks for metadata, writing the row-offset index to ``index_path`` if given.
+        
+        Files that cannot be parsed are still stored, with empty metadata.
+        The chunk iterator is always consumed to the end.
+        """
+        try:
+            metadata = scan_csv_stream(
+                chunks, index_stride=settings.csv_index_stride if index_path else None
+            )
+            if index_path is not None:
+                write_row_index(index_path, settings.csv_index_stride, metadata["row_offsets"])
+        except BadRequestError as e:
+            logger.warning(f"Could not scan CSV file {filename}: {e.detail}")
+            metadata = {}
+        # Finish whatever the scan did not consume (e.g. writes it drives)
+        for _ in chunks:
+            pass
+        
+        return {
+            "headers": metadata.get("headers"),
+            "delimiter": metadata.get("delimiter"),
+            "encoding": metadata.get("encoding"),
+            "row_count": metadata.get("row_count"),
+            "data_offset": metadata.get("data_offset"),
+        }
+    
+    @staticmethod
+    def _delete_stored(file_key: str) -> None:
+        """Delete a stored file and its sidecars from storage (blocking)."""
+        # The file goes first: build_columnar_copy relies on this order
+        storage.delete(file_key)
+        storage.delete(get_index_key(file_key))
+        storage.delete(get_seek_table_key(file_key))
+        storage.delete(get_columnar_key(file_key))
+        storage.delete(get_profile_key(file_key))
+        storage.delete(get_search_index_key(file_key))
+    
+    @staticmethod
+    async def get_by_id(db: AsyncSession, file_id: int) -> Optional[CSVFile]:
         """Get CSV file by ID."""
-        return db.query(CSVFile).filter(CSVFile.id == file_id).first()
+        result = await db.execute(select(CSVFile).where(CSVFile.id == file_id))
+        return result.scalars().first()
     
     @staticmethod
-    def get_all(db: Session, skip: int = 0, limit: int = 100) -> List[CSVFile]:
-        """Get all CSV files with pagination."""
-        return (
-            db.query(CSVFile)
-            .order_by(CSVFile.uploaded_at.desc())
-            .offset(skip)
+    async def get_all(
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 100,
+        after: Optional[Tuple[datetime, int]] = None
+    ) -> List[Row]:
+        """
+        Get all CSV files with pagination, newest first.
+        
+        Returns plain rows holding the CSVFileResponse fields, with the
+        uploader's username joined in, so a page costs a single query and
+        no ORM objects are built.
+        
+        Args:
+            db: Database session
+            skip: Number of records to skip (offset mode)
+            limit: Maximum number of records to return
+            after: (uploaded_at, id) of the last row of the previous page;
+                when given, seeks past it instead of using skip
+        """
+        query = (
+            select(
+                CSVFile.id,
+                CSVFile.filename,
+                CSVFile.file_size,
+                CSVFile.uploader_id,
+                User.username.label("uploader_username"),
+                CSVFile.uploaded_at,
+                CSVFile.row_count,
+            )
+            .join(User, CSVFile.uploader_id == User.id)
+            .order_by(CSVFile.uploaded_at.desc(), CSVFile.id.desc())
             .limit(limit)
-            .all()
         )
+        if after is not None:
+            query = query.where(tuple_(CSVFile.uploaded_at, CSVFile.id) < after)
+        else:
+            query = query.offset(skip)
+        result = await db.execute(query)
+        return list(result.all())
+    
+    @staticmethod
+    def get_etag(csv_file: CSVFile, content_encoding: Optional[str] = None) -> str:
+        """
+        Get a strong ETag for a stored file.
+        
+        Uses the SHA-256 digest recorded at upload. Files uploaded before
+        hashing was added get a tag built from their ID, size and upload
+        time, which is equally stable since stored files never change.
+        Each content encoding is a separate representation with its own tag.
+        """
+        if csv_file.content_hash:
+            tag = csv_file.content_hash
+        else:
+            uploaded = int(csv_file.uploaded_at.timestamp())
+            tag = f"{csv_file.id:x}-{csv_file.file_size:x}-{uploaded:x}"
+        if content_encoding:
+            tag += f"-{content_encoding}"
+        return f'"{tag}"'
+    
+    @staticmethod
+    def read_rows(
+        csv_file: CSVFile,
+        max_rows: int = 100,
+        offset: int = 0,
+        query: Optional[RowQuery] = None
+    ) -> Dict[str, Any]:
+        """
+        Read a page of rows from a stored CSV file.
+        
+        Pages are parsed from the CSV text, starting at the nearest row
+        recorded in the file's row index. A query that filters or sorts
+        scans the whole file, through its columnar copy once the background
+        conversion has built one; ``offset`` and ``max_rows`` then page
+        through the matching rows (at most MAX_SORTED_OFFSET rows in when
+        sorting). Values are returned as strings either way.
+        
+        Returns:
+            Dictionary with filename, headers, rows, and total_rows (rows
+            matching the query's filters, if any)
+        
+        Raises:
+            BadRequestError: If the query is invalid for this file
+        """
+        file_key = csv_file.file_path
+        query = query or RowQuery()
+        if csv_file.row_count is None and (query.columns or query.scans):
+            raise BadRequestError(
+                "This file was uploaded before column selection, filtering and "
+                "sorting were supported; upload it again to use them"
+            )
+        
+        if csv_file.row_count is not None:
+            query.validate(csv_file.headers or [])
+            if query.sort and offset > MAX_SORTED_OFFSET:
+                raise BadRequestError(
+                    f"Sorted views can start at most {MAX_SORTED_OFFSET} rows in; "
+                    "narrow the query with filters instead"
+                )
+            if query.scans:
+                result = query_columnar_rows(
+                    file_key, query, offset=offset, max_rows=max_rows
+                ) or query_csv_rows(
+                    file_key,
+                    headers=csv_file.headers,
+                    delimiter=csv_file.delimiter,
+                    encoding=csv_file.encoding,
+                    data_offset=csv_file.data_offset,
+                    query=query,
+                    offset=offset,
+                    max_rows=max_rows,
+                    compression=csv_file.compression
+                )
+                return {"filename": csv_file.filename, **result}
+            
+            # Use the metadata stored at upload instead of rescanning the file
+            rows = []
+            if offset < csv_file.row_count:
+                # Seek to the nearest indexed row rather than reading from the top
+                start_offset, skip_rows = (
+                    locate_row(get_index_key(file_key), offset)
+                    or (csv_file.data_offset, offset)
+                )
+                rows = read_csv_rows(
+                    file_key,
+                    headers=csv_file.headers,
+                    delimiter=csv_file.delimiter,
+                    encoding=csv_file.encoding,
+                    start_offset=start_offset,
+                    max_rows=max_rows,
+                    skip_rows=skip_rows,
+                    compression=csv_file.compression
+                )
+            if query.columns:
+                rows = [{column: row.get(column) for column in query.columns} for row in rows]
+            return {
+                "filename": csv_file.filename,
+                "headers": query.output_columns(csv_file.headers) if csv_file.row_count else [],
+                "rows": rows,
+                "total_rows": csv_file.row_count
+            }
+        
+        # Files uploaded before metadata was recorded
+        parsed = parse_csv_file(
+            file_key, max_rows=max_rows, offset=offset, compression=csv_file.compression
+        )
+        # The stored name is a content digest for deduplicated files
+        return {**parsed, "filename": csv_file.filename}
+    
+    @staticmethod
+    def get_stats(csv_file: CSVFile) -> Dict[str, Any]:
+        """
+        Get the stored per-column profile of a CSV file (blocking).
+        
+        Profiles are computed once, in the background after upload. Files
+        stored before profiling existed have theirs queued on first request.
+        
+        Returns:
+            Dictionary with status ("ready", "pending", "failed" or
+            "unavailable" for files without upload metadata), row_count,
+            computed_at, columns and error
+        """
+        if csv_file.row_count is None:
+            return {"status": "unavailable", "row_count": None, "columns": []}
+        
+        profile = read_profile(csv_file.file_path)
+        if profile is None:
+            CSVService._schedule_profile(csv_file)
+            return {"status": "pending", "row_count": csv_file.row_count, "columns": []}
+        if "error" in profile:
+            return {
+                "status": "failed",
+                "row_count": csv_file.row_count,
+                "computed_at": profile["computed_at"],
+                "columns": [],
+                "error": profile["error"]
+            }
+        return {"status": "ready", **profile}
+    
+    @staticmethod
+    async def _delete_row(db: AsyncSession, csv_file: CSVFile) -> Optional[str]:
+        """
+        Delete a CSV file's row and release its blob (not committed).
+        
+        Returns:
+            Storage key of the file's contents if nothing references them
+            any more, else None
+        """
+        await db.delete(csv_file)
+        if csv_file.blob_id is None:
+            # Uploaded before deduplication; the file is not shared
+            return csv_file.file_path
+        await db.flush()
+        return await CSVService._release_blob(db, csv_file.blob_id)
+    
+    @staticmethod
+    async def release_user_files(db: AsyncSession, user_id: int) -> List[str]:
+        """
+        Delete the rows of every CSV file a user uploaded, releasing their blobs.
+        
+        Nothing is committed, so the caller can delete the user in the same
+        transaction; once it commits, pass the returned keys to
+        delete_stored_files().
+        
+        Returns:
+            Storage keys of contents no longer referenced by any file
+        """
+        result = await db.execute(
+            select(CSVFile).where(CSVFile.uploader_id == user_id).order_by(CSVFile.id)
+        )
+        unreferenced_paths = []
+        for csv_file in result.scalars().all():
+            unreferenced_path = await CSVService._delete_row(db, csv_file)
+            if unreferenced_path is not None:
+                unreferenced_paths.append(unreferenced_path)
+        return unreferenced_paths
+    
+    @staticmethod
+    async def delete_stored_files(file_keys: List[str]) -> None:
+        """Delete stored files and their sidecar indexes from storage."""
+        for file_key in file_keys:
+            await run_blocking(CSVService._delete_stored, file_key)
     
     @staticmethod
-    def delete_file(db: Session, file_id: int) -> bool:
-        """Delete a CSV file."""
-        csv_file = CSVService.get_by_id(db, file_id)
+    async def delete_file(db: AsyncSession, file_id: int) -> bool:
+        """
+        Delete a CSV file.
+        
+        Shared contents are only removed from disk with their last reference.
+        """
+        csv_file = await CSVService.get_by_id(db, file_id)
         if not csv_file:
             return False
         
-        # Delete file from disk
-        delete_file_util(csv_file.file_path)
+        # Delete from database, releasing the blob
+        unreferenced_path = await CSVService._delete_row(db, csv_file)
+        await db.commit()
         
-        # Delete from database
-        db.delete(csv_file)
-        db.commit()
+        # Delete the file and its sidecar indexes once nothing points at them
+        if unreferenced_path is not None:
+            await run_blocking(CSVService._delete_stored, unreferenced_path)
         
         logger.info(f"CSV file deleted: {csv_file.filename}")
         return True
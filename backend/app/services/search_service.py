@@ -0,0 +1,235 @@
+"""Search service for full-text search across CSV files."""
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+from sqlalchemy import delete, func, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.csv_file import CSVFile
+from app.models.csv_blob import CSVBlob
+from app.models.csv_search_term import CSVSearchTerm
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, engine
+from app.core.exceptions import BadRequestError
+from app.core.executor import run_blocking, submit_background
+from app.utils.file_utils import generate_unique_filename, get_file_path
+from app.utils.search_index import (
+    build_search_index,
+    lookup_rows,
+    read_term_hashes,
+    term_hash,
+    tokenize,
+)
+from app.utils.logger import logger
+
+MAX_QUERY_TERMS = 16
+_INSERT_BATCH_SIZE = 10000
+
+# Indexing tasks in flight, kept referenced so they are not garbage collected
+_indexing_tasks: Set[asyncio.Task] = set()
+
+
+def _insert_terms():
+    """Build an INSERT into csv_search_terms that skips terms already recorded."""
+    dialect = postgresql if engine.dialect.name == "postgresql" else sqlite
+    return dialect.insert(CSVSearchTerm).on_conflict_do_nothing()
+
+
+class SearchService:
+    """Service for full-text search across CSV files."""
+    
+    @staticmethod
+    def schedule_indexing(csv_file: CSVFile) -> None:
+        """Queue the search indexing of a newly stored file's blob."""
+        if not settings.search_indexing or csv_file.blob_id is None or csv_file.row_count is None:
+            return
+        task = asyncio.create_task(SearchService.index_blob(csv_file))
+        _indexing_tasks.add(task)
+        task.add_done_callback(_indexing_tasks.discard)
+    
+    @staticmethod
+    async def index_blob(csv_file: CSVFile) -> bool:
+        """
+        Add the blob of a CSV file to the search index.
+        
+        The blob's sidecar is built in the background pool. Its terms are
+        then recorded in batches, each in its own transaction, so the blob
+        row is not locked meanwhile; a last short transaction marks the
+        blob as indexed if it still exists. Terms recorded for a blob
+        deleted meanwhile are removed again; terms already recorded (by an
+        interrupted or concurrent run) are skipped.
+        
+        Returns:
+            Whether this call marked the blob as indexed
+        """
+        scratch_name = generate_unique_filename(csv_file.filename)
+        scratch_path = get_file_path(scratch_name + ".terms.part")
+        terms_path = get_file_path(scratch_name + ".hashes.part")
+        blob_id = csv_file.blob_id
+        try:
+            term_count = await asyncio.wrap_future(submit_background(
+                build_search_index,
+                csv_file.file_path,
+                headers=csv_file.headers,
+                delimiter=csv_file.delimiter,
+                encoding=csv_file.encoding,
+                data_offset=csv_file.data_offset,
+                compression=csv_file.compression,
+                scratch_path=scratch_path,
+                terms_path=terms_path
+            ))
+            if term_count is None:
+                return False
+        
+            async with AsyncSessionLocal() as db:
+                try:
+                    with open(terms_path, "rb") as terms:
+                        while True:
+                            batch = await run_blocking(read_term_hashes, terms, _INSERT_BATCH_SIZE)
+                            if not batch:
+                                break
+                            await db.execute(
+                                _insert_terms(),
+                                [{"term_hash": key, "blob_id": blob_id} for key in batch]
+                            )
+                            await db.commit()
+                    
+                    result = await db.execute(
+                        update(CSVBlob)
+                        .where(CSVBlob.id == blob_id, CSVBlob.search_indexed_at.is_(None))
+                        .values(search_indexed_at=datetime.utcnow())
+                        .returning(CSVBlob.id)
+                        .execution_options(synchronize_session=False)
+                    )
+                    marked = result.first() is not None
+                    await db.commit()
+                except IntegrityError:
+                    # The blob was deleted during the inserts (foreign key)
+                    await db.rollback()
+                    marked = False
+                
+                if not marked:
+                    # Indexed by another run meanwhile, or deleted, in which
+                    # case its terms were pruned before some of these went in
+                    if await db.scalar(select(CSVBlob.id).where(CSVBlob.id == blob_id)) is None:
+                        await db.execute(
+                            delete(CSVSearchTerm)
+                            .where(CSVSearchTerm.blob_id == blob_id)
+                            .execution_options(synchronize_session=False)
+                        )
+                        await db.commit()
+                    return False
+        except Exception as e:
+            logger.error(f"Could not index {csv_file.file_path} for search: {e}")
+            return False
+        finally:
+            terms_path.unlink(missing_ok=True)
+        
+        logger.info(f"Search terms recorded for {csv_file.file_path} ({term_count} terms)")
+        return True
+    
+    @staticmethod
+    def _lookup_blobs(
+        blobs: Dict[int, str],
+        term_hashes: List[int],
+        max_positions: int
+    ) -> Dict[int, Optional[Tuple[int, List[int]]]]:
+        """Find the matching rows of each candidate blob in its sidecar (blocking)."""
+        matches: Dict[int, Optional[Tuple[int, List[int]]]] = {}
+        for blob_id, file_path in blobs.items():
+            found = lookup_rows(file_path, term_hashes, max_positions)
+            matches[blob_id] = found if found and found[0] else None
+        return matches
+    
+    @staticmethod
+    async def search(
+        db: AsyncSession,
+        query: str,
+        limit: int = 20,
+        max_positions: int = 20
+    ) -> Dict[str, Any]:
+        """
+        Find the files and rows containing every term of a query.
+        
+        Candidate files (those whose content contains every term
+        somewhere) come from the database, newest uploads first; the
+        sidecar of each distinct blob then gives the rows containing all
+        terms. At most settings.search_max_candidates sidecars are read
+        per search.
+        
+        Args:
+            db: Database session
+            query: Free text, split into terms like the indexed cells
+            limit: Maximum number of files to return
+            max_positions: Maximum row numbers returned per file
+        
+        Returns:
+            Dictionary with terms and results (file_id, filename,
+            uploaded_at, match_count and rows for each matching file)
+        
+        Raises:
+            BadRequestError: If the query has no terms or too many
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            raise BadRequestError("Search query contains no searchable terms")
+        if len(terms) > MAX_QUERY_TERMS:
+            raise BadRequestError(f"Search query has more than {MAX_QUERY_TERMS} terms")
+        term_hashes = list(dict.fromkeys(term_hash(term) for term in terms))
+        
+        matching_blobs = (
+            select(CSVSearchTerm.blob_id)
+            .where(CSVSearchTerm.term_hash.in_(term_hashes))
+            .group_by(CSVSearchTerm.blob_id)
+            .having(func.count() == len(term_hashes))
+        )
+        candidates = (
+            select(CSVFile.id, CSVFile.filename, CSVFile.uploaded_at, CSVFile.blob_id, CSVBlob.file_path)
+            .join(CSVBlob, CSVFile.blob_id == CSVBlob.id)
+            .where(CSVFile.blob_id.in_(matching_blobs))
+            .order_by(CSVFile.uploaded_at.desc(), CSVFile.id.desc())
+        )
+        results: List[Dict[str, Any]] = []
+        # Sidecar lookups by blob id, None for blobs without a matching row;
+        # copies of the same content share one lookup
+        rows_by_blob: Dict[int, Optional[Tuple[int, List[int]]]] = {}
+        after: Optional[Tuple[datetime, int]] = None
+        while len(results) < limit:
+            statement = candidates
+            if after is not None:
+                statement = statement.where(tuple_(CSVFile.uploaded_at, CSVFile.id) < after)
+            files = (await db.execute(statement.limit(limit))).all()
+            if not files:
+                break
+            after = (files[-1].uploaded_at, files[-1].id)
+            
+            pending: Dict[int, str] = {}
+            for file in files:
+                if file.blob_id in rows_by_blob or file.blob_id in pending:
+                    continue
+                if len(rows_by_blob) + len(pending) >= settings.search_max_candidates:
+                    break
+                pending[file.blob_id] = file.file_path
+            if pending:
+                rows_by_blob.update(await run_blocking(
+                    SearchService._lookup_blobs, pending, term_hashes, max_positions
+                ))
+            
+            for file in files:
+                if file.blob_id not in rows_by_blob:
+                    # Candidate budget spent
+                    return {"terms": terms, "results": results[:limit]}
+                found = rows_by_blob[file.blob_id]
+                if found is None:
+                    continue
+                match_count, rows = found
+                results.append({
+                    "file_id": file.id,
+                    "filename": file.filename,
+                    "uploaded_at": file.uploaded_at,
+                    "match_count": match_count,
+                    "rows": rows,
+                })
+        
+        return {"terms": terms, "results": results[:limit]}
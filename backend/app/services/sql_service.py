@@ -0,0 +1,111 @@
+"""SQL service for read-only queries over CSV files."""
+import re
+from typing import AsyncIterator, Dict
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.csv_file import CSVFile
+from app.core.config import settings
+from app.core.exceptions import NotFoundError, BadRequestError
+from app.core.executor import run_blocking
+from app.utils.sql_engine import SQLResult, TableSource, open_sql_query, sql_enabled
+from app.utils.logger import logger
+
+MAX_QUERY_TABLES = 8
+_TABLE_NAME_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]{0,62}$")
+
+
+class SQLService:
+    """Service for read-only SQL queries over CSV files."""
+    
+    @staticmethod
+    async def open_query(db: AsyncSession, sql: str, tables: Dict[str, int]) -> SQLResult:
+        """
+        Start a SQL query over CSV files.
+        
+        Args:
+            db: Database session
+            sql: A single SELECT statement
+            tables: CSV file id to expose under each table name the query uses
+        
+        Returns:
+            The open result; the caller must close it
+        
+        Raises:
+            BadRequestError: If SQL queries are disabled, a table name or
+                file is unusable, the files are larger than the engine's
+                memory limit, or the query cannot start
+            NotFoundError: If a file does not exist
+        """
+        if not sql_enabled():
+            raise BadRequestError("SQL queries are not enabled on this server")
+        if not tables or len(tables) > MAX_QUERY_TABLES:
+            raise BadRequestError(f"Name between 1 and {MAX_QUERY_TABLES} tables to query")
+        invalid = sorted(name for name in tables if not _TABLE_NAME_PATTERN.match(name))
+        if invalid:
+            raise BadRequestError(f"Invalid table name(s): {', '.join(invalid)}")
+        
+        result = await db.execute(select(CSVFile).where(CSVFile.id.in_(set(tables.values()))))
+        files = {csv_file.id: csv_file for csv_file in result.scalars()}
+        # Loaded tables take about as much memory as the CSV text; files
+        # that could not fit in the engine are refused before loading
+        memory_limit = settings.sql_memory_limit_mb * 1024 * 1024
+        if sum(csv_file.file_size for csv_file in files.values()) > memory_limit:
+            raise BadRequestError(
+                f"The files are too large to query with SQL "
+                f"(at most {settings.sql_memory_limit_mb} MB in total)"
+            )
+        sources = {}
+        for name, file_id in tables.items():
+            csv_file = files.get(file_id)
+            if csv_file is None:
+                raise NotFoundError("CSV file", str(file_id))
+            headers = csv_file.headers or []
+            # Files uploaded before metadata was recorded, or that could not be scanned
+            if csv_file.row_count is None or not headers:
+                raise BadRequestError(f"CSV file {file_id} cannot be queried with SQL")
+            if len(set(headers)) != len(headers):
+                raise BadRequestError(f"CSV file {file_id} has duplicate column names")
+            sources[name] = TableSource(
+                file_key=csv_file.file_path,
+                headers=headers,
+                delimiter=csv_file.delimiter,
+                compression=csv_file.compression,
+                data_offset=csv_file.data_offset
+            )
+        
+        return await run_blocking(open_sql_query, sql, sources)
+    
+    @staticmethod
+    async def query_csv(db: AsyncSession, sql: str, tables: Dict[str, int]) -> AsyncIterator[bytes]:
+        """
+        Run a SQL query over CSV files, returning its result as streamed CSV.
+        
+        The first rows are fetched before returning, so most failures are
+        raised here rather than after a response has started.
+        
+        Raises:
+            BadRequestError: If the query cannot run (see open_query)
+            NotFoundError: If a file does not exist
+        """
+        result = await SQLService.open_query(db, sql, tables)
+        try:
+            first = await run_blocking(result.fetch_csv)
+        except BaseException:
+            await run_blocking(result.close)
+            raise
+        return SQLService._stream(result, first)
+    
+    @staticmethod
+    async def _stream(result: SQLResult, first: bytes) -> AsyncIterator[bytes]:
+        """Yield the rows of an open result, closing it when done."""
+        try:
+            chunk = first
+            while chunk:
+                yield chunk
+                chunk = await run_blocking(result.fetch_csv)
+        except BadRequestError as e:
+            # The response has started; ending it early is all that is left
+            logger.warning(f"SQL query aborted mid-stream: {e.detail}")
+            raise
+        finally:
+            await run_blocking(result.close)
@@ -1,34 +1,72 @@
 """User service for business logic."""
-from typing import Optional
-from sqlalchemy.orm import Session
+from typing import Any, Dict, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import User
 from app.models.enums import UserRole
-from app.core.security import get_password_hash, verify_password
+from app.services.csv_service import CSVService
+from app.core.security import get_password_hash_async, verify_password_async
 from app.core.exceptions import BadRequestError
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.utils.logger import logger
 
+# Identity and role of recently authenticated users, keyed by token subject
+# (email). Entries are dropped when a user changes on this worker; other
+# workers see the change once the TTL runs out.
+user_cache: TTLCache[str, Dict[str, Any]] = TTLCache(
+    maxsize=settings.auth_cache_size,
+    ttl_seconds=settings.auth_cache_ttl_seconds,
+)
+
 
 class UserService:
     """Service for user-related operations."""
     
     @staticmethod
-    def get_by_id(db: Session, user_id: int) -> Optional[User]:
+    async def get_by_id(db: AsyncSession, user_id: int) -> Optional[User]:
         """Get user by ID."""
-        return db.query(User).filter(User.id == user_id).first()
+        result = await db.execute(select(User).where(User.id == user_id))
+        return result.scalars().first()
     
     @staticmethod
-    def get_by_username(db: Session, username: str) -> Optional[User]:
+    async def get_by_username(db: AsyncSession, username: str) -> Optional[User]:
         """Get user by username."""
-        return db.query(User).filter(User.username == username).first()
+        result = await db.execute(select(User).where(User.username == username))
+        return result.scalars().first()
     
     @staticmethod
-    def get_by_email(db: Session, email: str) -> Optional[User]:
+    async def get_by_email(db: AsyncSession, email: str) -> Optional[User]:
         """Get user by email."""
-        return db.query(User).filter(User.email == email).first()
+        result = await db.execute(select(User).where(User.email == email))
+        return result.scalars().first()
+    
+    @staticmethod
+    async def get_authenticated_user(db: AsyncSession, email: str) -> Optional[User]:
+        """
+        Get the user behind a token subject, served from user_cache when warm.
+        
+        Cache hits return a transient User holding only identity and role
+        columns, so no database round-trip is made.
+        """
+        cached = user_cache.get(email)
+        if cached is not None:
+            return User(**cached)
+        
+        user = await UserService.get_by_email(db, email)
+        if user is not None:
+            user_cache.set(email, {
+                "id": user.id,
+                "username": user.username,
+                "email": user.email,
+                "role": user.role,
+                "created_at": user.created_at,
+            })
+        return user
     
     @staticmethod
-    def create_user(
-        db: Session,
+    async def create_user(
+        db: AsyncSession,
         username: str,
         email: str,
         password: str,
@@ -36,16 +74,16 @@ class UserService:
     ) -> User:
         """Create a new user."""
         # Check if user already exists by username
-        existing_user = UserService.get_by_username(db, username)
+        existing_user = await UserService.get_by_username(db, username)
         if existing_user:
             raise BadRequestError("Username already registered")
         
         # Check if email already exists
-        existing_email = UserService.get_by_email(db, email)
+        existing_email = await UserService.get_by_email(db, email)
         if existing_email:
             raise BadRequestError("Email already registered")
         
-        hashed_password = get_password_hash(password)
+        hashed_password = await get_password_hash_async(password)
         new_user = User(
             username=username,
             email=email,
@@ -54,33 +92,48 @@ class UserService:
         )
         
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
         
         logger.info(f"User created: {username} ({email}) with role {role.value}")
         return new_user
     
     @staticmethod
-    def authenticate(db: Session, email: str, password: str) -> Optional[User]:
+    async def authenticate(db: AsyncSession, email: str, password: str) -> Optional[User]:
         """Authenticate a user by email."""
-        user = UserService.get_by_email(db, email)
+        user = await UserService.get_by_email(db, email)
         if not user:
             return None
         
-        if not verify_password(password, user.hashed_password):
+        if not await verify_password_async(password, user.hashed_password):
             return None
         
         logger.info(f"User authenticated: {email}")
         return user
     
     @staticmethod
-    def get_all_users(db: Session, skip: int = 0, limit: int = 100) -> list[User]:
-        """Get all users with pagination."""
-        return db.query(User).offset(skip).limit(limit).all()
+    async def get_all_users(
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 100,
+        after_id: Optional[int] = None
+    ) -> list[User]:
+        """
+        Get all users with pagination, ordered by ID.
+        
+        If ``after_id`` is given, seeks past that ID instead of using skip.
+        """
+        query = select(User).order_by(User.id).limit(limit)
+        if after_id is not None:
+            query = query.where(User.id > after_id)
+        else:
+            query = query.offset(skip)
+        result = await db.execute(query)
+        return list(result.scalars().all())
     
     @staticmethod
-    def update_user(
-        db: Session,
+    async def update_user(
+        db: AsyncSession,
         user_id: int,
         username: Optional[str] = None,
         email: Optional[str] = None,
@@ -88,47 +141,58 @@ class UserService:
         role: Optional[UserRole] = None
     ) -> Optional[User]:
         """Update a user."""
-        user = UserService.get_by_id(db, user_id)
+        user = await UserService.get_by_id(db, user_id)
         if not user:
             return None
+        original_email = user.email
         
         # Check if username is being changed and if it's already taken
         if username and username != user.username:
-            existing_user = UserService.get_by_username(db, username)
+            existing_user = await UserService.get_by_username(db, username)
             if existing_user:
                 raise BadRequestError("Username already registered")
             user.username = username
         
         # Check if email is being changed and if it's already taken
         if email and email != user.email:
-            existing_email = UserService.get_by_email(db, email)
+            existing_email = await UserService.get_by_email(db, email)
             if existing_email:
                 raise BadRequestError("Email already registered")
             user.email = email
         
         # Update password if provided
         if password:
-            user.hashed_password = get_password_hash(password)
+            user.hashed_password = await get_password_hash_async(password)
         
         # Update role if provided
         if role is not None:
             user.role = role
         
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
+        user_cache.invalidate(original_email)
+        user_cache.invalidate(user.email)
         
         logger.info(f"User updated: {user.username} ({user.email})")
         return user
     
     @staticmethod
-    def delete_user(db: Session, user_id: int) -> bool:
-        """Delete a user."""
-        user = UserService.get_by_id(db, user_id)
+    async def delete_user(db: AsyncSession, user_id: int) -> bool:
+        """
+        Delete a user and the CSV files they uploaded.
+        
+        The files' blobs are released like in CSVService.delete_file, and
+        stored contents no other file shares are removed from storage.
+        """
+        user = await UserService.get_by_id(db, user_id)
         if not user:
             return False
         
-        db.delete(user)
-        db.commit()
+        unreferenced_paths = await CSVService.release_user_files(db, user.id)
+        await db.delete(user)
+        await db.commit()
+        await CSVService.delete_stored_files(unreferenced_paths)
+        user_cache.invalidate(user.email)
         logger.info(f"User deleted: {user.username}")
         return True
 
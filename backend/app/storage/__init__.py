@@ -0,0 +1,37 @@
+"""Pluggable storage for uploaded files.
+
+The backend is chosen by settings.storage_backend: "local" keeps files
+under settings.upload_directory on this host; "s3" keeps them in an
+S3-compatible bucket shared by every API node.
+"""
+from pathlib import Path
+from app.core.config import settings
+from app.storage.base import StorageBackend
+from app.storage.local import LocalStorage
+
+
+def create_storage() -> StorageBackend:
+    """Create the storage backend selected by settings.storage_backend."""
+    backend = settings.storage_backend
+    if backend == "local":
+        return LocalStorage(Path(settings.upload_directory))
+    if backend == "s3":
+        from app.storage.s3 import S3Storage
+
+        if not settings.s3_bucket:
+            raise ValueError("storage_backend 's3' requires s3_bucket")
+        return S3Storage(
+            bucket=settings.s3_bucket,
+            prefix=settings.s3_prefix,
+            endpoint_url=settings.s3_endpoint_url,
+            region=settings.s3_region,
+            access_key_id=settings.s3_access_key_id,
+            secret_access_key=settings.s3_secret_access_key,
+            presign_expiry_seconds=settings.storage_presign_expiry_seconds,
+        )
+    raise ValueError(f"Unknown storage_backend {backend!r}; expected 'local' or 's3'")
+
+
+storage = create_storage()
+
+__all__ = ["StorageBackend", "LocalStorage", "create_storage", "storage"]
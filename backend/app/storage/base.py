@@ -0,0 +1,98 @@
+"""Storage backend interface."""
+import io
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+
+class _RangeReader(io.RawIOBase):
+    """Seekable read-only view of an object, fetching each read with read_range()."""
+
+    def __init__(self, backend: "StorageBackend", key: str):
+        self._backend = backend
+        self._key = key
+        self._size = backend.size(key)
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self._size
+        self._position = max(offset, 0)
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        data = self._backend.read_range(self._key, self._position, len(buffer))
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
+class StorageBackend(ABC):
+    """
+    Where uploaded files and their sidecar indexes live.
+
+    Objects are addressed by string keys such as
+    ``blobs/ab/<digest>_<id>.csv``. All methods block and are meant to be
+    called from the I/O thread pool. Missing objects raise
+    FileNotFoundError.
+    """
+
+    @abstractmethod
+    def put_file(self, key: str, local_path: Path) -> None:
+        """Store a finished local file under ``key``, consuming the local file."""
+
+    @abstractmethod
+    def open_read(self, key: str, start: int = 0) -> BinaryIO:
+        """Open an object for streaming reads from byte ``start``. The caller closes it."""
+
+    @abstractmethod
+    def read_range(self, key: str, start: int, length: int) -> bytes:
+        """Read up to ``length`` bytes starting at byte ``start``."""
+
+    @abstractmethod
+    def size(self, key: str) -> int:
+        """Get the size of an object in bytes."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Delete an object; missing objects are ignored."""
+
+    def open_random_access(self, key: str) -> BinaryIO:
+        """
+        Open an object for seekable reads (e.g. Parquet footers and row groups).
+
+        The default issues one read_range() per buffered read. The caller closes it.
+        """
+        return io.BufferedReader(_RangeReader(self, key), 1024 * 1024)
+
+    def read_bytes(self, key: str) -> bytes:
+        """Read a whole object (meant for small sidecars)."""
+        with self.open_read(key) as stream:
+            return stream.read()
+
+    def presigned_url(
+        self,
+        key: str,
+        filename: str,
+        media_type: str,
+        content_encoding: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Get a time-limited URL clients can download an object from directly.
+
+        Returns:
+            The URL, or None if this backend cannot serve clients itself
+        """
+        return None
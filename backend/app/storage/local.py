@@ -0,0 +1,48 @@
+"""Local filesystem storage backend."""
+import os
+from pathlib import Path
+from typing import BinaryIO
+from app.storage.base import StorageBackend
+
+
+class LocalStorage(StorageBackend):
+    """Stores objects as files under a root directory."""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def _path(self, key: str) -> Path:
+        path = Path(key)
+        # Rows written before storage backends hold full paths
+        # (e.g. "uploads/name.csv") rather than keys
+        if path.is_absolute() or path.parts[:len(self.root.parts)] == self.root.parts:
+            return path
+        return self.root / path
+
+    def put_file(self, key: str, local_path: Path) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(local_path, path)
+
+    def open_read(self, key: str, start: int = 0) -> BinaryIO:
+        f = open(self._path(key), "rb")
+        if start:
+            f.seek(start)
+        return f
+
+    def open_random_access(self, key: str) -> BinaryIO:
+        return open(self._path(key), "rb")
+
+    def read_range(self, key: str, start: int, length: int) -> bytes:
+        with open(self._path(key), "rb") as f:
+            f.seek(start)
+            return f.read(length)
+
+    def size(self, key: str) -> int:
+        return self._path(key).stat().st_size
+
+    def delete(self, key: str) -> None:
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
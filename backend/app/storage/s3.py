@@ -0,0 +1,137 @@
+"""S3-compatible object storage backend (AWS S3, MinIO, Ceph, ...).
+
+Requires boto3, which is only imported when this backend is selected.
+"""
+import io
+from pathlib import Path
+from typing import BinaryIO, Optional
+from app.storage.base import StorageBackend
+
+
+class _BodyReader(io.RawIOBase):
+    """Adapts a botocore StreamingBody to the io stack."""
+
+    def __init__(self, body):
+        self._body = body
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._body.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            self._body.close()
+        super().close()
+
+
+class S3Storage(StorageBackend):
+    """Stores objects in an S3 bucket, optionally under a key prefix."""
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        presign_expiry_seconds: int = 300
+    ):
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError:
+            raise RuntimeError("The S3 storage backend requires boto3 (pip install boto3)")
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.presign_expiry_seconds = presign_expiry_seconds
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            # Path-style addressing works with MinIO and other stand-ins
+            config=Config(signature_version="s3v4", s3={"addressing_style": "path"}),
+        )
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    def _get(self, key: str, byte_range: Optional[str] = None):
+        from botocore.exceptions import ClientError
+
+        params = {"Bucket": self.bucket, "Key": self._key(key)}
+        if byte_range:
+            params["Range"] = byte_range
+        try:
+            return self.client.get_object(**params)
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code in ("NoSuchKey", "404"):
+                raise FileNotFoundError(key)
+            if code == "InvalidRange":
+                return None
+            raise
+
+    def put_file(self, key: str, local_path: Path) -> None:
+        # Multipart for large files, streamed from disk
+        self.client.upload_file(str(local_path), self.bucket, self._key(key))
+        local_path.unlink()
+
+    def open_read(self, key: str, start: int = 0) -> BinaryIO:
+        response = self._get(key, f"bytes={start}-" if start else None)
+        if response is None:
+            # Starting at or past the end
+            return io.BytesIO(b"")
+        return io.BufferedReader(_BodyReader(response["Body"]), 64 * 1024)
+
+    def read_range(self, key: str, start: int, length: int) -> bytes:
+        if length <= 0:
+            return b""
+        response = self._get(key, f"bytes={start}-{start + length - 1}")
+        if response is None:
+            return b""
+        with response["Body"] as body:
+            return body.read()
+
+    def size(self, key: str) -> int:
+        from botocore.exceptions import ClientError
+
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                raise FileNotFoundError(key)
+            raise
+        return response["ContentLength"]
+
+    def delete(self, key: str) -> None:
+        # S3 deletes are idempotent
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def presigned_url(
+        self,
+        key: str,
+        filename: str,
+        media_type: str,
+        content_encoding: Optional[str] = None
+    ) -> Optional[str]:
+        from app.utils.file_response import content_disposition
+
+        params = {
+            "Bucket": self.bucket,
+            "Key": self._key(key),
+            "ResponseContentDisposition": content_disposition(filename),
+            "ResponseContentType": media_type,
+        }
+        if content_encoding:
+            params["ResponseContentEncoding"] = content_encoding
+        return self.client.generate_presigned_url(
+            "get_object", Params=params, ExpiresIn=self.presign_expiry_seconds
+        )
@@ -0,0 +1,359 @@
+"""Columnar (Parquet) copies of uploaded CSV files.
+
+Filtering or sorting a view scans every row, and over CSV text that means
+decoding and splitting every line, whole. Once an upload is stored, a
+background job converts it into a Parquet sidecar (``<file key>.parquet``)
+holding the same cells column by column. Queries then read only the
+columns they use, one row group at a time, and evaluate filters with
+vectorized pyarrow compute.
+
+The copy keeps the text of every cell as is (empty cells become nulls),
+so rows served from it are exactly those of the CSV text; like the text
+path (app.utils.csv_query), queries compare cells as numbers only where
+both sides are numbers. Plain pages are always read from the CSV text.
+
+pyarrow is optional: without it, or with settings.columnar_copies off,
+no copies are built and queries fall back to the CSV text.
+"""
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from app.core.config import settings
+from app.storage import storage
+from app.utils.csv_query import NUMBER_PATTERN, RowQuery, parse_number
+from app.utils.compression import open_stored
+from app.utils.logger import logger
+
+COLUMNAR_SUFFIX = ".parquet"
+
+
+def get_columnar_key(file_key: str) -> str:
+    """Get the storage key of the Parquet copy of a stored file."""
+    return file_key + COLUMNAR_SUFFIX
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.csv
+        import pyarrow.parquet
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def pyarrow_installed() -> bool:
+    """Check whether pyarrow can be imported."""
+    return _import_pyarrow() is not None
+
+
+def columnar_enabled() -> bool:
+    """Check whether columnar copies are turned on and pyarrow is installed."""
+    return settings.columnar_copies and _import_pyarrow() is not None
+
+
+def _csv_options(pa, headers: List[str], delimiter: str):
+    # Every column is read as text; only empty cells become nulls
+    return {
+        "read_options": pa.csv.ReadOptions(
+            column_names=headers, block_size=settings.upload_chunk_size
+        ),
+        "parse_options": pa.csv.ParseOptions(delimiter=delimiter, newlines_in_values=True),
+        "convert_options": pa.csv.ConvertOptions(
+            column_types={name: pa.string() for name in headers},
+            null_values=[""],
+            strings_can_be_null=True,
+        ),
+    }
+
+
+def _write_parquet(
+    pa,
+    file_key: str,
+    headers: List[str],
+    delimiter: str,
+    compression: Optional[str],
+    data_offset: int,
+    parquet_path: Path
+) -> int:
+    """Stream a stored CSV file into a local Parquet file, returning the rows written."""
+    group_size = settings.columnar_row_group_size
+    written = 0
+    with open_stored(file_key, compression, data_offset) as stream:
+        reader = pa.csv.open_csv(stream, **_csv_options(pa, headers, delimiter))
+        with pa.parquet.ParquetWriter(parquet_path, reader.schema) as writer:
+            pending = pa.Table.from_batches([], reader.schema)
+            for batch in reader:
+                pending = pa.concat_tables([pending, pa.Table.from_batches([batch])])
+                # Write full row groups only, so every group has group_size rows
+                full = pending.num_rows - pending.num_rows % group_size
+                if full:
+                    writer.write_table(pending.slice(0, full), row_group_size=group_size)
+                    pending = pending.slice(full)
+                    written += full
+            if pending.num_rows:
+                writer.write_table(pending, row_group_size=group_size)
+                written += pending.num_rows
+    return written
+
+
+def build_columnar_copy(
+    file_key: str,
+    headers: List[str],
+    delimiter: str,
+    compression: Optional[str],
+    data_offset: int,
+    row_count: int,
+    scratch_path: Path
+) -> bool:
+    """
+    Convert a stored CSV file into its Parquet copy (blocking).
+
+    The CSV is streamed from its first data row with the header and
+    delimiter recorded at upload. Failures are logged, not raised, since
+    queries fall back to the CSV text.
+
+    Args:
+        file_key: Storage key of the CSV file
+        headers: Column names recorded at upload (must be unique)
+        delimiter: Delimiter recorded at upload
+        compression: Storage compression of the file
+        data_offset: Byte offset of the first data row
+        row_count: Data rows recorded at upload, checked against the copy
+        scratch_path: Local file to build the copy in before it is stored
+
+    Returns:
+        Whether a copy was stored
+    """
+    pa = _import_pyarrow()
+    if pa is None or not row_count or len(set(headers)) != len(headers):
+        return False
+
+    columnar_key = get_columnar_key(file_key)
+    try:
+        written = _write_parquet(
+            pa, file_key, headers, delimiter, compression, data_offset, scratch_path
+        )
+        if written != row_count:
+            logger.warning(
+                f"Columnar copy of {file_key} has {written} rows, expected {row_count}; discarded"
+            )
+            return False
+
+        storage.put_file(columnar_key, scratch_path)
+        # The file may have been deleted meanwhile; deletion removes the
+        # file before its sidecars, so a copy stored after that is ours to drop
+        try:
+            storage.size(file_key)
+        except FileNotFoundError:
+            storage.delete(columnar_key)
+            return False
+    except Exception as e:
+        logger.error(f"Could not build columnar copy of {file_key}: {e}")
+        return False
+    finally:
+        scratch_path.unlink(missing_ok=True)
+
+    logger.info(f"Columnar copy built: {columnar_key} ({written} rows)")
+    return True
+
+
+@contextmanager
+def open_columnar_copy(file_key: str) -> Iterator[Optional[Any]]:
+    """
+    Open the Parquet copy of a stored file.
+
+    Yields:
+        A pyarrow.parquet.ParquetFile, or None if there is no usable copy
+        (not built yet, conversion failed, built with inferred column
+        types by an earlier version, or columnar copies disabled)
+    """
+    if not columnar_enabled():
+        yield None
+        return
+    pa = _import_pyarrow()
+    try:
+        source = storage.open_random_access(get_columnar_key(file_key))
+    except FileNotFoundError:
+        yield None
+        return
+    with source:
+        try:
+            parquet = pa.parquet.ParquetFile(source)
+        except pa.ArrowException as e:
+            logger.warning(f"Ignoring unreadable columnar copy of {file_key}: {e}")
+            parquet = None
+        if parquet is not None and not all(
+            pa.types.is_string(field.type) for field in parquet.schema_arrow
+        ):
+            parquet = None
+        yield parquet
+
+
+def _to_rows(table) -> List[Dict[str, Any]]:
+    # Nulls are the empty cells; the CSV text path returns those as ""
+    return [
+        {column: "" if value is None else value for column, value in row.items()}
+        for row in table.to_pylist()
+    ]
+
+
+# Plain decimal numbers, as in app.utils.csv_query (RE2 syntax)
+_NUMBER_REGEX = f"^(?:{NUMBER_PATTERN})$"
+
+
+def iter_text_batches(
+    file_key: str,
+    headers: List[str],
+    delimiter: str,
+    compression: Optional[str],
+    data_offset: int
+) -> Iterator[Any]:
+    """
+    Stream the cells of a stored CSV file as text (blocking).
+
+    Batches come from the Parquet copy when there is one, otherwise from
+    the CSV text; either way every column is a string column and only
+    empty cells are nulls.
+
+    Yields:
+        pyarrow.RecordBatch objects, one row group or CSV block at a time
+
+    Raises:
+        RuntimeError: If pyarrow is not installed
+    """
+    pa = _import_pyarrow()
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed")
+    with open_columnar_copy(file_key) as parquet:
+        if parquet is not None:
+            yield from parquet.iter_batches()
+            return
+    with open_stored(file_key, compression, data_offset) as stream:
+        yield from pa.csv.open_csv(stream, **_csv_options(pa, headers, delimiter))
+
+
+_COMPUTE_FUNCTIONS = {
+    "eq": "equal",
+    "ne": "not_equal",
+    "lt": "less",
+    "lte": "less_equal",
+    "gt": "greater",
+    "gte": "greater_equal",
+}
+
+
+def _numbers(pa, values):
+    """Get the cells of a text column that are numbers as float64, and nulls for the rest."""
+    numeric = pa.compute.match_substring_regex(values, _NUMBER_REGEX)
+    return pa.compute.cast(
+        pa.compute.if_else(numeric, values, pa.scalar(None, pa.string())), pa.float64()
+    )
+
+
+def _filter_mask(pa, table, filters: List[tuple]):
+    compute = pa.compute
+    mask = None
+    for column, op, value in filters:
+        values = table[column]
+        if op == "contains":
+            condition = compute.match_substring(values, value, ignore_case=True)
+        else:
+            function = _COMPUTE_FUNCTIONS[op]
+            condition = compute.call_function(function, [values, pa.scalar(value, pa.string())])
+            number = parse_number(value)
+            if number is not None:
+                # Numbers compare as numbers, the other cells as text
+                numbers = _numbers(pa, values)
+                condition = compute.if_else(
+                    compute.is_valid(numbers),
+                    compute.call_function(function, [numbers, pa.scalar(number, pa.float64())]),
+                    condition,
+                )
+        mask = condition if mask is None else compute.and_(mask, condition)
+    return mask
+
+
+def _sort_indices(pa, table, sort: List[tuple]):
+    """
+    Order rows like the CSV text path: for each key, numbers (by value)
+    before text, reversed when descending, and empty cells last either way.
+    """
+    compute = pa.compute
+    keys = {}
+    sort_keys = []
+    for position, (column, desc) in enumerate(sort):
+        values = table[column]
+        numbers = _numbers(pa, values)
+        is_number = compute.is_valid(numbers)
+        keys[f"{position}:rank"] = compute.if_else(
+            is_number,
+            pa.scalar(0, pa.int8()),
+            compute.if_else(
+                compute.is_valid(values), pa.scalar(1, pa.int8()), pa.scalar(None, pa.int8())
+            ),
+        )
+        keys[f"{position}:number"] = numbers
+        keys[f"{position}:text"] = compute.if_else(
+            is_number, pa.scalar(None, pa.string()), values
+        )
+        order = "descending" if desc else "ascending"
+        sort_keys.extend((key, order) for key in list(keys)[-3:])
+    # Stable, so rows that compare equal keep their file order; nulls go last
+    return compute.sort_indices(pa.table(keys), sort_keys=sort_keys)
+
+
+def query_columnar_rows(
+    file_key: str,
+    query: RowQuery,
+    offset: int = 0,
+    max_rows: int = 100
+) -> Optional[Dict[str, Any]]:
+    """
+    Filter, sort and project rows of the Parquet copy of a stored file (blocking).
+
+    Row groups are scanned one at a time with vectorized pyarrow compute,
+    reading only the columns the query uses. Without a sort, only the
+    filter columns are read once the page is full (to count matches);
+    with one, the best offset + max_rows rows are kept between groups.
+    Results are the same as those of app.utils.csv_query.query_csv_rows.
+
+    Returns:
+        Dictionary with headers, rows and total_rows (rows matching the
+        filters), or None if the file has no usable copy or the query
+        must run on the CSV text
+    """
+    # Case-insensitive matching of non-ASCII text differs between pyarrow
+    # and Python; leave those substrings to the CSV text path
+    if any(op == "contains" and not value.isascii() for _, op, value in query.filters):
+        return None
+    with open_columnar_copy(file_key) as parquet:
+        if parquet is None:
+            return None
+        pa = _import_pyarrow()
+        headers = parquet.schema_arrow.names
+        output = query.output_columns(headers)
+        needed = query.needed_columns(headers)
+        keep = offset + max_rows
+        page = None
+        total = 0
+        for group in range(parquet.metadata.num_row_groups):
+            collecting = query.sort or page is None or page.num_rows < keep
+            table = parquet.read_row_group(
+                group, columns=needed if collecting else query.filter_columns()
+            )
+            if query.filters:
+                table = table.filter(_filter_mask(pa, table, query.filters))
+            total += table.num_rows
+            if not collecting:
+                continue
+            if page is not None:
+                table = pa.concat_tables([page, table])
+            if query.sort:
+                indices = _sort_indices(pa, table, query.sort)
+                table = table.take(indices[:keep])
+            page = table.slice(0, keep)
+
+        rows = _to_rows(page.slice(offset, max_rows).select(output)) if page is not None else []
+        return {"headers": output, "rows": rows, "total_rows": total}
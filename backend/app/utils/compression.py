@@ -0,0 +1,183 @@
+"""Compressed storage for uploaded CSV files.
+
+Compressed files are a single ordinary gzip stream, so the stored blob
+can be sent as-is with ``Content-Encoding: gzip``. The compressor is
+fully flushed after every upload chunk, which byte-aligns the deflate
+stream and resets its dictionary: decompression can restart at any of
+those points. A sidecar seek table object records each restart point, in both
+compressed and uncompressed bytes, so readers can reach an uncompressed
+offset by decompressing at most one chunk of data they do not need.
+Layout (little-endian unsigned 64-bit integers):
+
+    [compressed offset][uncompressed offset] for each restart point, in order
+
+The first restart point is always (0, 0), the start of the gzip header.
+"""
+import bisect
+import io
+import struct
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+from app.core.config import settings
+from app.storage import storage
+
+GZIP = "gzip"
+STORAGE_COMPRESSIONS = ("none", GZIP)
+SEEK_TABLE_SUFFIX = ".seek"
+_RESTART_POINT = struct.Struct("<QQ")
+_GZIP_WBITS = 16 + zlib.MAX_WBITS  # deflate with a gzip header and trailer
+_RAW_WBITS = -zlib.MAX_WBITS  # bare deflate, as found after a restart point
+_READ_SIZE = 64 * 1024
+
+
+def get_storage_compression() -> Optional[str]:
+    """Get the compression to use for new uploads, or None to store raw bytes."""
+    compression = settings.storage_compression
+    if compression not in STORAGE_COMPRESSIONS:
+        raise ValueError(
+            f"Invalid storage_compression {compression!r}; "
+            f"expected one of {', '.join(STORAGE_COMPRESSIONS)}"
+        )
+    return None if compression == "none" else compression
+
+
+def get_seek_table_key(file_key: str) -> str:
+    """Get the storage key of the sidecar seek table for a compressed file."""
+    return file_key + SEEK_TABLE_SUFFIX
+
+
+class GzipSeekableWriter:
+    """File-like writer producing a gzip stream that can be entered after each write()."""
+
+    def __init__(self, raw: BinaryIO, compresslevel: Optional[int] = None):
+        self.raw = raw
+        self._compressor = zlib.compressobj(
+            settings.storage_compression_level if compresslevel is None else compresslevel,
+            zlib.DEFLATED, _GZIP_WBITS
+        )
+        self.restart_points: List[Tuple[int, int]] = [(0, 0)]
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        if data:
+            self.raw.write(self._compressor.compress(data))
+            self.raw.write(self._compressor.flush(zlib.Z_FULL_FLUSH))
+            self._position += len(data)
+            self.restart_points.append((self.raw.tell(), self._position))
+        return len(data)
+
+    def tell(self) -> int:
+        """Return the number of uncompressed bytes written."""
+        return self._position
+
+    def close(self) -> None:
+        """Finish the stream, writing the gzip trailer."""
+        self.raw.write(self._compressor.flush())
+
+
+def write_seek_table(table_path: Path, restart_points: List[Tuple[int, int]]) -> None:
+    """Write a gzip seek table to disk."""
+    with open(table_path, "wb") as f:
+        for point in restart_points:
+            f.write(_RESTART_POINT.pack(*point))
+
+
+def locate_restart_point(table_key: str, offset: int) -> Tuple[int, int]:
+    """
+    Find the last restart point at or before an uncompressed byte offset.
+
+    Returns:
+        Tuple of (compressed offset, uncompressed offset) of the restart
+        point; (0, 0) if there is no table
+    """
+    try:
+        data = storage.read_bytes(table_key)
+    except OSError:
+        return 0, 0
+    points = list(_RESTART_POINT.iter_unpack(data[:len(data) - len(data) % _RESTART_POINT.size]))
+    starts = [uncompressed for _, uncompressed in points]
+    position = bisect.bisect_right(starts, offset) - 1
+    if position < 0:
+        return 0, 0
+    return points[position]
+
+
+class _InflateReader(io.RawIOBase):
+    """Raw stream decompressing deflate data read from another stream."""
+
+    def __init__(self, raw: BinaryIO, wbits: int):
+        self.raw = raw
+        self._inflater = zlib.decompressobj(wbits)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._inflater.eof:
+            data = self._inflater.unconsumed_tail or self.raw.read(_READ_SIZE)
+            if not data:
+                raise EOFError("Compressed file ended before the end-of-stream marker")
+            # Bound the output so a highly compressed chunk cannot balloon
+            out = self._inflater.decompress(data, len(buffer))
+            if out:
+                buffer[:len(out)] = out
+                return len(out)
+        return 0
+
+
+def _discard(stream: BinaryIO, count: int) -> None:
+    while count > 0:
+        data = stream.read(min(count, _READ_SIZE))
+        if not data:
+            break
+        count -= len(data)
+
+
+def iter_stored_chunks(
+    file_key: str,
+    compression: Optional[str] = None,
+    chunk_size: int = _READ_SIZE
+) -> Iterator[bytes]:
+    """Yield a stored file's uncompressed contents as byte chunks."""
+    with open_stored(file_key, compression) as stream:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+@contextmanager
+def open_stored(
+    file_key: str,
+    compression: Optional[str] = None,
+    offset: int = 0
+) -> Iterator[BinaryIO]:
+    """
+    Open a stored file for reading its uncompressed bytes.
+
+    Args:
+        file_key: Storage key of the file
+        compression: Compression recorded for the file (None for raw)
+        offset: Uncompressed byte offset to position the stream at
+
+    Raises:
+        FileNotFoundError: If the file is not in storage
+    """
+    if compression is None:
+        with storage.open_read(file_key, offset) as raw:
+            yield raw
+        return
+    if compression != GZIP:
+        raise ValueError(f"Unsupported storage compression {compression!r}")
+
+    compressed_start, uncompressed_start = locate_restart_point(
+        get_seek_table_key(file_key), offset
+    )
+    with storage.open_read(file_key, compressed_start) as raw:
+        wbits = _GZIP_WBITS if compressed_start == 0 else _RAW_WBITS
+        with io.BufferedReader(_InflateReader(raw, wbits), _READ_SIZE) as stream:
+            _discard(stream, offset - uncompressed_start)
+            yield stream
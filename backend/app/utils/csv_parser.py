@@ -1,57 +1,305 @@
 """CSV parsing utilities."""
+import codecs
 import csv
-from typing import List, Dict, Any
+import io
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 from pathlib import Path
+from app.core.config import settings
 from app.core.exceptions import BadRequestError
+from app.utils.compression import open_stored
 
+CHUNK_SIZE = 1024 * 1024  # 1 MB
+SNIFF_SAMPLE_SIZE = 1024
 
-def parse_csv_file(file_path: Path, max_rows: int = 100) -> Dict[str, Any]:
+
+def iter_file_chunks(file_path: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield a file's contents as fixed-size byte chunks."""
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def detect_encoding(sample: bytes) -> str:
+    """Detect the text encoding of a CSV file from its first bytes."""
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    return "utf-8"
+
+
+def sniff_delimiter(sample: str) -> str:
+    """Detect the delimiter used in a CSV sample."""
+    return csv.Sniffer().sniff(sample).delimiter
+
+
+class _LineReader:
+    """
+    Split a stream of byte chunks into decoded lines.
+
+    Tracks the byte offset just past the last line handed out, so a
+    csv.reader consuming this iterator can report where each row ends.
+    A line spanning several chunks is joined once its newline arrives;
+    lines longer than ``max_line_length`` bytes are rejected.
+    """
+
+    def __init__(
+        self,
+        chunks: Iterable[bytes],
+        encoding: str = "utf-8",
+        max_line_length: Optional[int] = None
+    ):
+        self._chunks = iter(chunks)
+        self.encoding = encoding
+        self.max_line_length = max_line_length
+        self._peeked: List[bytes] = []
+        self._parts: List[bytes] = []  # start of the current line, no newline yet
+        self._parts_size = 0
+        self._pending: List[bytes] = []
+        self.offset = 0
+
+    def peek(self, size: int) -> bytes:
+        """Return up to ``size`` bytes from the start of the stream without consuming them."""
+        peeked_size = sum(len(chunk) for chunk in self._peeked)
+        while peeked_size < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._peeked.append(chunk)
+            peeked_size += len(chunk)
+        return b"".join(self._peeked)[:size]
+
+    def _next_chunk(self) -> Optional[bytes]:
+        if self._peeked:
+            return self._peeked.pop(0)
+        return next(self._chunks, None)
+
+    def _check_length(self, size: int) -> None:
+        if self.max_line_length is not None and size > self.max_line_length:
+            raise BadRequestError(
+                f"CSV file has a line longer than {self.max_line_length} bytes"
+            )
+
+    def __iter__(self) -> "_LineReader":
+        return self
+
+    def __next__(self) -> str:
+        while not self._pending:
+            chunk = self._next_chunk()
+            if chunk is None:
+                if not self._parts:
+                    raise StopIteration
+                self._pending.append(b"".join(self._parts))
+                self._parts = []
+                self._parts_size = 0
+                break
+            if b"\n" not in chunk:
+                self._parts.append(chunk)
+                self._parts_size += len(chunk)
+                self._check_length(self._parts_size)
+                continue
+            lines = chunk.split(b"\n")
+            tail = lines.pop()
+            if self._parts:
+                self._check_length(self._parts_size + len(lines[0]))
+                self._parts.append(lines[0])
+                lines[0] = b"".join(self._parts)
+            self._parts = [tail] if tail else []
+            self._parts_size = len(tail)
+            self._pending = [line + b"\n" for line in reversed(lines)]
+        line = self._pending.pop()
+        self._check_length(len(line))
+        self.offset += len(line)
+        return line.decode(self.encoding)
+
+
+def scan_csv_stream(
+    chunks: Iterable[bytes],
+    index_stride: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Scan a CSV byte stream once and collect its metadata.
+
+    Args:
+        chunks: Iterable of raw byte chunks making up the file
+        index_stride: If set, record the byte offset of every Nth data row
+
+    Returns:
+        Dictionary with headers, delimiter, encoding, row_count,
+        data_offset (byte offset of the first data row) and row_offsets
+    """
+    lines = _LineReader(chunks, max_line_length=settings.csv_max_line_bytes)
+    head = lines.peek(SNIFF_SAMPLE_SIZE)
+    encoding = detect_encoding(head)
+    lines.encoding = encoding
+
+    try:
+        sample = head.decode(encoding, errors="ignore")
+        if not sample.strip():
+            return {
+                "headers": [],
+                "delimiter": ",",
+                "encoding": encoding,
+                "row_count": 0,
+                "data_offset": 0,
+                "row_offsets": [],
+            }
+        delimiter = sniff_delimiter(sample)
+
+        reader = csv.reader(lines, delimiter=delimiter)
+        headers: List[str] = []
+        for row in reader:
+            if row:
+                headers = row
+                break
+        data_offset = lines.offset
+        row_offsets: List[int] = []
+        if index_stride:
+            row_count = 0
+            row_start = data_offset
+            for row in reader:
+                if row:
+                    if row_count % index_stride == 0:
+                        row_offsets.append(row_start)
+                    row_count += 1
+                row_start = lines.offset
+        else:
+            row_count = sum(1 for row in reader if row)
+    except csv.Error as e:
+        raise BadRequestError(f"Error parsing CSV file: {str(e)}")
+    except UnicodeDecodeError as e:
+        raise BadRequestError(f"Error reading CSV file: {str(e)}")
+
+    return {
+        "headers": headers,
+        "delimiter": delimiter,
+        "encoding": encoding,
+        "row_count": row_count,
+        "data_offset": data_offset,
+        "row_offsets": row_offsets,
+    }
+
+
+def scan_csv_file(file_path: Path, index_stride: Optional[int] = None) -> Dict[str, Any]:
+    """Scan a CSV file on disk and collect its metadata."""
+    return scan_csv_stream(iter_file_chunks(file_path), index_stride=index_stride)
+
+
+def count_remaining_rows(reader: csv.DictReader, limit: Optional[int] = None) -> int:
+    """
+    Count the rows left in a DictReader without building a dict per row.
+
+    Blank lines are skipped, matching how DictReader itself iterates. If
+    ``limit`` is given, stop after consuming that many rows.
+    """
+    if reader.fieldnames is None:
+        return 0
+    rows = (row for row in reader.reader if row)
+    return sum(1 for _ in islice(rows, limit))
+
+
+def read_csv_rows(
+    file_key: str,
+    headers: List[str],
+    delimiter: str,
+    encoding: str,
+    start_offset: int,
+    max_rows: int = 100,
+    skip_rows: int = 0,
+    compression: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Read rows from a CSV file using metadata collected at upload time.
+
+    Seeks straight to ``start_offset`` (the first data row, or a row found
+    through the row-offset index), so neither the delimiter nor the header
+    has to be detected again.
+
+    Args:
+        file_key: Storage key of the CSV file
+        headers: Column names recorded at upload
+        delimiter: Delimiter recorded at upload
+        encoding: Encoding recorded at upload
+        start_offset: Byte offset of the row to start reading from
+        max_rows: Maximum number of rows to return
+        skip_rows: Rows to skip after seeking before collecting results
+        compression: Storage compression recorded at upload; offsets are
+            always into the uncompressed data
+    """
+    try:
+        with open_stored(file_key, compression, start_offset) as raw:
+            # The BOM, if any, sits before the header, not at start_offset
+            text_encoding = "utf-8" if encoding == "utf-8-sig" else encoding
+            f = io.TextIOWrapper(raw, encoding=text_encoding, newline="")
+            reader = csv.DictReader(f, fieldnames=headers, delimiter=delimiter)
+            return list(islice(reader, skip_rows, skip_rows + max_rows))
+    except FileNotFoundError:
+        raise BadRequestError("CSV file not found in storage")
+    except csv.Error as e:
+        raise BadRequestError(f"Error parsing CSV file: {str(e)}")
+    except Exception as e:
+        raise BadRequestError(f"Error reading CSV file: {str(e)}")
+
+
+def parse_csv_file(
+    file_key: str,
+    max_rows: int = 100,
+    offset: int = 0,
+    compression: Optional[str] = None
+) -> Dict[str, Any]:
     """
     Parse a CSV file and return headers and rows.
-    
+
+    Only the first ``max_rows`` rows are materialized as dicts; the rest of
+    the file is streamed through to count rows, so memory stays flat
+    regardless of file size.
+
     Args:
-        file_path: Path to the CSV file
+        file_key: Storage key of the CSV file
         max_rows: Maximum number of rows to return (for performance)
-    
+        offset: Number of data rows to skip before collecting results
+        compression: Storage compression of the file; compressed files are
+            decompressed as they are streamed
+
     Returns:
         Dictionary with filename, headers, rows, and total_rows
     """
-    if not file_path.exists():
-        raise BadRequestError("CSV file not found on disk")
-    
+    filename = Path(file_key).name
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            # Try to detect delimiter
-            sample = f.read(1024)
-            f.seek(0)
-            sniffer = csv.Sniffer()
-            delimiter = sniffer.sniff(sample).delimiter
-            
+        # Try to detect delimiter (compressed streams cannot seek back,
+        # so the sample is read through a separate handle)
+        with open_stored(file_key, compression) as raw:
+            sample = io.TextIOWrapper(raw, encoding='utf-8', newline='').read(SNIFF_SAMPLE_SIZE)
+        delimiter = sniff_delimiter(sample)
+
+        with open_stored(file_key, compression) as raw, \
+                io.TextIOWrapper(raw, encoding='utf-8', newline='') as f:
             reader = csv.DictReader(f, delimiter=delimiter)
-            rows = list(reader)
-            
-            if not rows:
+            skipped = count_remaining_rows(reader, limit=offset) if offset else 0
+            rows: List[Dict[str, Any]] = list(islice(reader, max_rows))
+
+            if not rows and not skipped:
                 return {
-                    "filename": file_path.name,
+                    "filename": filename,
                     "headers": [],
                     "rows": [],
                     "total_rows": 0
                 }
-            
-            headers = list(rows[0].keys())
-            total_rows = len(rows)
-            
-            # Limit rows for performance
-            limited_rows = rows[:max_rows]
-            
+
+            headers = list(reader.fieldnames)
+            total_rows = skipped + len(rows) + count_remaining_rows(reader)
+
             return {
-                "filename": file_path.name,
+                "filename": filename,
                 "headers": headers,
-                "rows": limited_rows,
+                "rows": rows,
                 "total_rows": total_rows
             }
+    except FileNotFoundError:
+        raise BadRequestError("CSV file not found in storage")
     except csv.Error as e:
         raise BadRequestError(f"Error parsing CSV file: {str(e)}")
     except Exception as e:
         raise BadRequestError(f"Error reading CSV file: {str(e)}")
-
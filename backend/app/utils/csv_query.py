@@ -0,0 +1,237 @@
+"""Filtering, sorting and column projection for CSV views.
+
+A RowQuery is parsed from the view endpoint's query parameters:
+
+    columns=name&columns=price    return only these columns, in this order
+    filter=price:gte:10           predicates, all of which must hold
+    filter=name:contains:smith
+    sort=-price&sort=name         sort keys, "-" for descending
+
+Operators are eq, ne, lt, lte, gt, gte and contains (case-insensitive
+substring). A query is answered in one streaming pass: over the columnar
+copy with pyarrow compute when the file has one
+(app.utils.columnar.query_columnar_rows), otherwise over the CSV text
+(query_csv_rows). Sorting keeps only the best offset + max_rows rows
+while scanning, so memory is bounded by the page rather than the file;
+sorted queries are limited to offsets up to MAX_SORTED_OFFSET.
+Values are compared as numbers when both sides are numbers (NUMBER_PATTERN),
+as text otherwise. Empty cells never match a predicate and sort last.
+"""
+import csv
+import heapq
+import io
+import operator
+import re
+from functools import cmp_to_key
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from app.core.exceptions import BadRequestError
+from app.utils.compression import open_stored
+
+FILTER_OPERATORS = ("eq", "ne", "lt", "lte", "gt", "gte", "contains")
+# Sorting keeps offset + max_rows rows while scanning; deeper pages are refused
+MAX_SORTED_OFFSET = 10000
+# The column is matched lazily, so values may contain ":"
+_FILTER_PATTERN = re.compile(rf"^(.+?):({'|'.join(FILTER_OPERATORS)}):(.*)$", re.DOTALL)
+# A number, for comparisons and sorting: plain decimal notation with an
+# optional exponent. Shared with the columnar path (also valid RE2).
+NUMBER_PATTERN = r"[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?"
+_NUMBER = re.compile(NUMBER_PATTERN)
+_COMPARISONS = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "lt": operator.lt,
+    "lte": operator.le,
+    "gt": operator.gt,
+    "gte": operator.ge,
+}
+
+
+class RowQuery:
+    """Column projection, filters and sort order requested for a view."""
+
+    def __init__(
+        self,
+        columns: Optional[List[str]] = None,
+        filters: Optional[List[Tuple[str, str, str]]] = None,
+        sort: Optional[List[Tuple[str, bool]]] = None
+    ):
+        self.columns = list(dict.fromkeys(columns)) if columns else None
+        self.filters = filters or []  # (column, operator, value)
+        self.sort = sort or []  # (column, descending)
+
+    @classmethod
+    def parse(
+        cls,
+        columns: Optional[Sequence[str]] = None,
+        filters: Optional[Sequence[str]] = None,
+        sort: Optional[Sequence[str]] = None
+    ) -> "RowQuery":
+        """
+        Parse view query parameters.
+
+        Raises:
+            BadRequestError: If a filter is malformed
+        """
+        parsed_filters = []
+        for spec in filters or []:
+            match = _FILTER_PATTERN.match(spec)
+            if match is None:
+                raise BadRequestError(
+                    f"Invalid filter {spec!r}; expected column:operator:value "
+                    f"with operator one of {', '.join(FILTER_OPERATORS)}"
+                )
+            parsed_filters.append(match.groups())
+        parsed_sort = [(key[1:], True) if key.startswith("-") else (key, False) for key in sort or []]
+        return cls(columns=list(columns or []), filters=parsed_filters, sort=parsed_sort)
+
+    @property
+    def scans(self) -> bool:
+        """Whether answering the query needs a pass over every row."""
+        return bool(self.filters or self.sort)
+
+    def validate(self, headers: List[str]) -> None:
+        """
+        Check that every referenced column exists.
+
+        Raises:
+            BadRequestError: If a column is unknown
+        """
+        referenced = (
+            (self.columns or [])
+            + [column for column, _, _ in self.filters]
+            + [column for column, _ in self.sort]
+        )
+        unknown = sorted(set(referenced) - set(headers))
+        if unknown:
+            raise BadRequestError(f"Unknown column(s): {', '.join(unknown)}")
+
+    def output_columns(self, headers: List[str]) -> List[str]:
+        """Get the columns returned to the client."""
+        return self.columns or list(headers)
+
+    def filter_columns(self) -> List[str]:
+        """Get the columns predicates are evaluated on."""
+        return list(dict.fromkeys(column for column, _, _ in self.filters))
+
+    def needed_columns(self, headers: List[str]) -> List[str]:
+        """Get every column the query reads, in file order."""
+        needed = set(self.output_columns(headers)) | set(self.filter_columns())
+        needed.update(column for column, _ in self.sort)
+        return [header for header in headers if header in needed]
+
+
+def parse_number(value: Optional[str]) -> Optional[float]:
+    """Parse a cell or filter value as a number, or return None if it is not one."""
+    if value is None or _NUMBER.fullmatch(value) is None:
+        return None
+    return float(value)
+
+
+def _matches(cell: Optional[str], op: str, value: str, number: Optional[float]) -> bool:
+    """Evaluate one predicate on a text cell, numerically if both sides are numbers."""
+    if cell is None or cell == "":
+        return False
+    if op == "contains":
+        return value.lower() in cell.lower()
+    cell_number = parse_number(cell) if number is not None else None
+    if cell_number is not None:
+        return _COMPARISONS[op](cell_number, number)
+    return _COMPARISONS[op](cell, value)
+
+
+def _sort_value(cell: Optional[str]) -> Tuple[int, Any]:
+    # Numbers before text; empty cells are ranked separately so they sort last
+    if cell is None or cell == "":
+        return (2, 0)
+    number = parse_number(cell)
+    return (0, number) if number is not None else (1, cell)
+
+
+def _compare_sort_values(
+    left: List[Tuple[int, Any]],
+    right: List[Tuple[int, Any]],
+    descending: List[bool]
+) -> int:
+    for a, b, desc in zip(left, right, descending):
+        if a == b:
+            continue
+        if a[0] == 2 or b[0] == 2:
+            return 1 if a[0] == 2 else -1
+        less = a < b
+        return (1 if less else -1) if desc else (-1 if less else 1)
+    return 0
+
+
+def query_csv_rows(
+    file_key: str,
+    headers: List[str],
+    delimiter: str,
+    encoding: str,
+    data_offset: int,
+    query: RowQuery,
+    offset: int = 0,
+    max_rows: int = 100,
+    compression: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Filter, sort and project a CSV file's rows in one pass over its text.
+
+    Args:
+        file_key: Storage key of the CSV file
+        headers: Column names recorded at upload
+        delimiter: Delimiter recorded at upload
+        encoding: Encoding recorded at upload
+        data_offset: Byte offset of the first data row
+        query: Projection, filters and sort order (already validated)
+        offset: Index of the first matching row to return
+        max_rows: Maximum number of rows to return
+        compression: Storage compression of the file
+
+    Returns:
+        Dictionary with headers, rows and total_rows (rows matching the filters)
+    """
+    output = query.output_columns(headers)
+    predicates = [(column, op, value, parse_number(value)) for column, op, value in query.filters]
+    sort_columns = [column for column, _ in query.sort]
+    descending = [desc for _, desc in query.sort]
+    sort_key = cmp_to_key(lambda a, b: _compare_sort_values(a, b, descending))
+    total = 0
+
+    def matching(reader: csv.DictReader) -> Iterator[Dict[str, Any]]:
+        nonlocal total
+        for row in reader:
+            if all(_matches(row.get(column), op, value, number) for column, op, value, number in predicates):
+                total += 1
+                yield row
+
+    try:
+        with open_stored(file_key, compression, data_offset) as raw:
+            # The BOM, if any, sits before the header, not at data_offset
+            text_encoding = "utf-8" if encoding == "utf-8-sig" else encoding
+            f = io.TextIOWrapper(raw, encoding=text_encoding, newline="")
+            reader = csv.DictReader(f, fieldnames=headers, delimiter=delimiter)
+            if query.sort:
+                # Stable, so rows that compare equal keep their file order
+                best = heapq.nsmallest(
+                    offset + max_rows,
+                    matching(reader),
+                    key=lambda row: sort_key([_sort_value(row.get(c)) for c in sort_columns]),
+                )
+                page = best[offset:]
+            else:
+                page = []
+                for row in matching(reader):
+                    if offset < total <= offset + max_rows:
+                        page.append(row)
+    except FileNotFoundError:
+        raise BadRequestError("CSV file not found in storage")
+    except csv.Error as e:
+        raise BadRequestError(f"Error parsing CSV file: {str(e)}")
+    except Exception as e:
+        raise BadRequestError(f"Error reading CSV file: {str(e)}")
+
+    return {
+        "headers": output,
+        "rows": [{column: row.get(column) for column in output} for row in page],
+        "total_rows": total,
+    }
@@ -0,0 +1,256 @@
+"""Conditional and byte-range file responses.
+
+Starlette's FileResponse always sends the whole file. These helpers add
+``If-None-Match``/``If-Modified-Since`` (304 responses), single-range
+``Range`` requests (206) and ``If-Range``, reading the file from the
+storage backend through the I/O thread pool. Compressed files can be sent as stored (with a
+Content-Encoding) or decompressed on the fly for clients that do not
+accept the encoding.
+"""
+import calendar
+from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+from typing import AsyncIterator, Dict, Optional, Tuple
+from urllib.parse import quote
+from fastapi import Request, Response, status
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
+from app.core.executor import run_blocking
+from app.storage import storage
+from app.utils.compression import open_stored
+
+
+def http_date(value: datetime) -> str:
+    """Format a naive UTC datetime as an HTTP date."""
+    return formatdate(calendar.timegm(value.utctimetuple()), usegmt=True)
+
+
+def content_disposition(filename: str) -> str:
+    """Build an attachment Content-Disposition header, as FileResponse does."""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def accepts_encoding(request: Request, encoding: str) -> bool:
+    """Check whether the request's Accept-Encoding allows a content coding."""
+    header = request.headers.get("accept-encoding", "")
+    wildcard = False
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding == encoding:
+            return quality > 0
+        if coding == "*":
+            wildcard = quality > 0
+    return wildcard
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so ignore any W/ prefix
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    """Check the request's validators against the current representation."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence over If-Modified-Since
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return calendar.timegm(last_modified.utctimetuple()) <= since.timestamp()
+    return False
+
+
+def parse_range_header(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single ``bytes=`` range.
+
+    Returns:
+        Inclusive (start, end) byte positions, or None if the header is
+        malformed or asks for several ranges (the whole file is sent then)
+
+    Raises:
+        ValueError: If the range is well-formed but cannot be satisfied
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = (part.strip() for part in spec.partition("-"))
+    if not sep or not (first or last):
+        return None
+    if (first and not first.isdigit()) or (last and not last.isdigit()):
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        if int(last) == 0 or size == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if start >= size:
+        raise ValueError("Range starts past the end of the file")
+    end = int(last) if last else size - 1
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+async def _iter_range(key: str, start: int, end: int) -> AsyncIterator[bytes]:
+    stream = await run_blocking(storage.open_read, key, start)
+    try:
+        position = start
+        while position <= end:
+            length = min(settings.upload_chunk_size, end - position + 1)
+            chunk = await run_blocking(stream.read, length)
+            if not chunk:
+                break
+            position += len(chunk)
+            yield chunk
+    finally:
+        await run_blocking(stream.close)
+
+
+async def _iter_decoded(key: str, compression: str) -> AsyncIterator[bytes]:
+    stream = await run_blocking(open_stored, key, compression)
+    try:
+        while True:
+            chunk = await run_blocking(stream.read, settings.upload_chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        await run_blocking(stream.close)
+
+
+def _base_headers(etag: str, last_modified: datetime, accept_ranges: str) -> Dict[str, str]:
+    return {
+        "ETag": etag,
+        "Last-Modified": http_date(last_modified),
+        "Accept-Ranges": accept_ranges,
+        # Downloads require auth; let the browser cache but always revalidate
+        "Cache-Control": "private, no-cache",
+    }
+
+
+async def file_download_response(
+    request: Request,
+    key: str,
+    filename: str,
+    etag: str,
+    last_modified: datetime,
+    media_type: str = "text/csv",
+    extra_headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Serve a stored file, honoring conditional and range request headers.
+
+    Args:
+        request: Incoming request
+        key: Storage key of the file
+        filename: Name offered to the client
+        etag: Quoted entity tag for the file's contents
+        last_modified: Naive UTC modification time
+        media_type: Content type of the file
+        extra_headers: Additional headers for every response (e.g. Content-Encoding)
+
+    Raises:
+        FileNotFoundError: If the file is missing (not checked for 304s)
+    """
+    headers = {**_base_headers(etag, last_modified, "bytes"), **(extra_headers or {})}
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    size = await run_blocking(storage.size, key)
+    headers["Content-Disposition"] = content_disposition(filename)
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # A stale If-Range means the client's partial copy is outdated: send it all
+    if range_header and (if_range is None or if_range.strip() == etag):
+        try:
+            byte_range = parse_range_header(range_header, size)
+        except ValueError:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers=headers,
+            )
+
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, status.HTTP_200_OK
+    else:
+        start, end = byte_range
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    return StreamingResponse(
+        _iter_range(key, start, end),
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type,
+    )
+
+
+async def decoded_download_response(
+    request: Request,
+    key: str,
+    filename: str,
+    compression: str,
+    size: int,
+    etag: str,
+    last_modified: datetime,
+    media_type: str = "text/csv",
+    extra_headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Serve a compressed file decompressed, for clients that cannot decode it.
+
+    Honors conditional requests; Range is not supported on this path, so
+    the whole file is always sent.
+
+    Args:
+        request: Incoming request
+        key: Storage key of the compressed file
+        filename: Name offered to the client
+        compression: Storage compression of the file
+        size: Uncompressed size in bytes
+        etag: Quoted entity tag for the uncompressed contents
+        last_modified: Naive UTC modification time
+        media_type: Content type of the file
+        extra_headers: Additional headers for every response (e.g. Vary)
+
+    Raises:
+        FileNotFoundError: If the file is missing (not checked for 304s)
+    """
+    headers = {**_base_headers(etag, last_modified, "none"), **(extra_headers or {})}
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # Fail before the response starts rather than mid-stream
+    await run_blocking(storage.size, key)
+    headers["Content-Disposition"] = content_disposition(filename)
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(
+        _iter_decoded(key, compression),
+        headers=headers,
+        media_type=media_type,
+    )
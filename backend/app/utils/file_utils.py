@@ -2,7 +2,7 @@
 import os
 import uuid
 from pathlib import Path
-from typing import Optional
+from typing import Any, BinaryIO, Iterator, Optional
 from fastapi import UploadFile
 from app.core.config import settings
 from app.core.exceptions import BadRequestError, ValidationError
@@ -36,6 +36,35 @@ def validate_csv_file(file: UploadFile) -> None:
             )
 
 
+def write_upload_chunks(
+    source: BinaryIO,
+    sink: BinaryIO,
+    hasher: Optional[Any] = None
+) -> Iterator[bytes]:
+    """
+    Stream an upload to ``sink`` in fixed-size chunks.
+
+    Each chunk is written (and fed to ``hasher``, if given) before it is
+    yielded, so callers can inspect the data in the same pass. The size
+    limit is enforced as data arrives, aborting oversized uploads mid-stream.
+    """
+    max_size_bytes = settings.max_file_size_mb * 1024 * 1024
+    written = 0
+    while True:
+        chunk = source.read(settings.upload_chunk_size)
+        if not chunk:
+            break
+        written += len(chunk)
+        if written > max_size_bytes:
+            raise ValidationError(
+                f"File size exceeds maximum allowed size of {settings.max_file_size_mb}MB"
+            )
+        sink.write(chunk)
+        if hasher is not None:
+            hasher.update(chunk)
+        yield chunk
+
+
 def sanitize_filename(filename: str) -> str:
     """Sanitize filename to prevent path traversal and other security issues."""
     # Remove path components
@@ -64,6 +93,18 @@ def get_file_path(filename: str) -> Path:
     return upload_dir / filename
 
 
+def get_blob_key(content_hash: str, suffix: str) -> str:
+    """
+    Get a fresh storage key for a content-addressed blob.
+    
+    Blobs are grouped by the first two hex digits of their digest. The
+    random suffix keeps a blob recreated after deletion from colliding with
+    files of the previous one that are still being removed.
+    """
+    unique_id = str(uuid.uuid4())[:8]
+    return f"blobs/{content_hash[:2]}/{content_hash}_{unique_id}{suffix}"
+
+
 def delete_file(file_path: str) -> bool:
     """Safely delete a file."""
     try:
@@ -0,0 +1,46 @@
+"""Opaque cursors for keyset pagination."""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Callable, Tuple
+from app.core.exceptions import BadRequestError
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _parse_datetime(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+# How each key type is read back out of a cursor
+_DECODERS: dict = {datetime: _parse_datetime, int: int}
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode the sort-key values of the last row on a page as an opaque cursor."""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: type) -> Tuple[Any, ...]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor: The opaque cursor string from the client
+        types: Expected type of each sort-key value, in order
+
+    Returns:
+        Tuple of decoded sort-key values
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise ValueError("Cursor has the wrong shape")
+        decoders: list[Callable[[Any], Any]] = [_DECODERS[t] for t in types]
+        return tuple(decode(value) for decode, value in zip(decoders, payload))
+    except (ValueError, TypeError, binascii.Error, UnicodeError):
+        raise BadRequestError("Invalid pagination cursor")
@@ -0,0 +1,293 @@
+"""Per-column statistics (profiles) of uploaded CSV files.
+
+A profile is computed once per stored file, in a single streaming pass in
+the background pool, and saved as a JSON sidecar (``<file key>.profile.json``)
+so it is never recomputed. Memory stays fixed whatever the file size:
+distinct counts are HyperLogLog estimates and quantiles come from a
+uniform reservoir sample of each numeric column.
+
+Column types are inferred from the text: a column is "integer", "float" or
+"boolean" if every non-empty cell parses as one, "string" otherwise, and
+"empty" if it has no values. Empty cells count as nulls.
+"""
+import csv
+import hashlib
+import io
+import json
+import math
+import random
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+from app.storage import storage
+from app.utils.compression import open_stored
+from app.utils.logger import logger
+
+PROFILE_SUFFIX = ".profile.json"
+HLL_PRECISION = 12  # 4096 registers, ~1.6% standard error
+QUANTILE_SAMPLE_SIZE = 10000
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+_BOOLEANS = {"true": True, "false": False}
+
+# Keys of profiles queued or being built in this process
+_pending: Set[str] = set()
+_pending_lock = threading.Lock()
+
+
+def get_profile_key(file_key: str) -> str:
+    """Get the storage key of the profile of a stored file."""
+    return file_key + PROFILE_SUFFIX
+
+
+class HyperLogLog:
+    """Fixed-size distinct-count estimator (Flajolet et al.)."""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+        self._rank_bits = 64 - precision
+        self._rank_mask = (1 << self._rank_bits) - 1
+
+    def add(self, value: str) -> None:
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest()
+        h = int.from_bytes(digest, "big")
+        index = h >> self._rank_bits
+        rank = self._rank_bits - (h & self._rank_mask).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+
+class ReservoirSample:
+    """Uniform fixed-size sample of a stream (Li's Algorithm L)."""
+
+    def __init__(self, size: int = QUANTILE_SAMPLE_SIZE, seed: int = 0):
+        self.size = size
+        self.values: List[float] = []
+        self._rng = random.Random(seed)
+        self._seen = 0
+        self._weight = 1.0
+        self._next = size
+
+    def _skip(self) -> None:
+        self._weight *= math.exp(math.log(1.0 - self._rng.random()) / self.size)
+        gap = math.log(1.0 - self._rng.random()) / math.log(1.0 - self._weight)
+        self._next += int(gap) + 1
+
+    def add(self, value: float) -> None:
+        if self._seen < self.size:
+            self.values.append(value)
+            if self._seen + 1 == self.size:
+                self._next = self.size - 1
+                self._skip()
+        elif self._seen == self._next:
+            self.values[self._rng.randrange(self.size)] = value
+            self._skip()
+        self._seen += 1
+
+    def quantiles(self, points=QUANTILES) -> Optional[Dict[str, float]]:
+        if not self.values:
+            return None
+        ordered = sorted(self.values)
+        last = len(ordered) - 1
+        result = {}
+        for q in points:
+            # Linear interpolation between the closest ranks
+            position = q * last
+            low = int(position)
+            high = min(low + 1, last)
+            value = ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+            result[f"p{round(q * 100)}"] = value
+        return result
+
+
+def _parse_number(value: str):
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    number = float(value)  # ValueError propagates
+    if not math.isfinite(number):
+        raise ValueError(value)
+    return number
+
+
+class ColumnProfile:
+    """Running statistics for one column."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.kind = "empty"  # -> integer/boolean -> float -> string
+        self.count = 0
+        self.null_count = 0
+        self.distinct = HyperLogLog()
+        self.text_min: Optional[str] = None
+        self.text_max: Optional[str] = None
+        self.number_min = None
+        self.number_max = None
+        self.total = 0
+        self.sample = ReservoirSample()
+
+    def add(self, value: Optional[str]) -> None:
+        if not value:
+            self.null_count += 1
+            return
+        self.count += 1
+        self.distinct.add(value)
+        if self.text_min is None or value < self.text_min:
+            self.text_min = value
+        if self.text_max is None or value > self.text_max:
+            self.text_max = value
+        if self.kind == "string":
+            return
+
+        if self.kind in ("empty", "boolean") and value.lower() in _BOOLEANS:
+            if self.kind == "empty":
+                self.kind = "boolean"
+            return
+        if self.kind == "boolean":
+            self.kind = "string"
+            return
+        try:
+            number = _parse_number(value)
+        except ValueError:
+            self.kind = "string"
+            return
+        if isinstance(number, float) and self.kind != "float":
+            self.kind = "float"
+        elif self.kind == "empty":
+            self.kind = "integer"
+        if self.number_min is None or number < self.number_min:
+            self.number_min = number
+        if self.number_max is None or number > self.number_max:
+            self.number_max = number
+        self.total += number
+        self.sample.add(number)
+
+    def to_dict(self) -> Dict[str, Any]:
+        numeric = self.kind in ("integer", "float")
+        if numeric:
+            minimum, maximum = self.number_min, self.number_max
+        elif self.kind == "boolean":
+            minimum = maximum = None
+        else:
+            minimum, maximum = self.text_min, self.text_max
+        return {
+            "name": self.name,
+            "type": self.kind,
+            "count": self.count,
+            "null_count": self.null_count,
+            "distinct_estimate": min(self.distinct.estimate(), self.count),
+            "min": minimum,
+            "max": maximum,
+            "mean": self.total / self.count if numeric and self.count else None,
+            "quantiles": self.sample.quantiles() if numeric else None,
+        }
+
+
+def profile_csv(
+    file_key: str,
+    headers: List[str],
+    delimiter: str,
+    encoding: str,
+    data_offset: int,
+    compression: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Compute the profile of a stored CSV file in one pass (blocking).
+
+    Returns:
+        Dictionary with row_count, columns (one dict per column) and computed_at
+    """
+    columns = [ColumnProfile(name) for name in headers]
+    row_count = 0
+    with open_stored(file_key, compression, data_offset) as raw:
+        # The BOM, if any, sits before the header, not at data_offset
+        text_encoding = "utf-8" if encoding == "utf-8-sig" else encoding
+        f = io.TextIOWrapper(raw, encoding=text_encoding, newline="")
+        width = len(columns)
+        for row in csv.reader(f, delimiter=delimiter):
+            if not row:
+                continue
+            row_count += 1
+            if len(row) < width:
+                row = row + [""] * (width - len(row))
+            for column, value in zip(columns, row):
+                column.add(value)
+    return {
+        "row_count": row_count,
+        "columns": [column.to_dict() for column in columns],
+        "computed_at": datetime.utcnow().isoformat(),
+    }
+
+
+def build_profile(
+    file_key: str,
+    headers: List[str],
+    delimiter: str,
+    encoding: str,
+    data_offset: int,
+    compression: Optional[str],
+    scratch_path: Path
+) -> bool:
+    """
+    Compute and store the profile of a stored CSV file (blocking).
+
+    Files that cannot be profiled get a profile holding only the error,
+    so the work is not retried.
+
+    Returns:
+        Whether a profile was stored
+    """
+    profile_key = get_profile_key(file_key)
+    try:
+        try:
+            profile = profile_csv(file_key, headers, delimiter, encoding, data_offset, compression)
+        except (csv.Error, UnicodeDecodeError) as e:
+            logger.warning(f"Could not profile {file_key}: {e}")
+            profile = {"error": str(e), "computed_at": datetime.utcnow().isoformat()}
+        scratch_path.write_text(json.dumps(profile), encoding="utf-8")
+        storage.put_file(profile_key, scratch_path)
+        # Deletion removes the file before its sidecars; see build_columnar_copy
+        try:
+            storage.size(file_key)
+        except FileNotFoundError:
+            storage.delete(profile_key)
+            return False
+    except Exception as e:
+        logger.error(f"Could not build profile of {file_key}: {e}")
+        return False
+    finally:
+        scratch_path.unlink(missing_ok=True)
+        with _pending_lock:
+            _pending.discard(file_key)
+
+    logger.info(f"Profile built: {profile_key}")
+    return True
+
+
+def claim_profile_build(file_key: str) -> bool:
+    """Mark a profile as queued, returning False if this process already queued it."""
+    with _pending_lock:
+        if file_key in _pending:
+            return False
+        _pending.add(file_key)
+        return True
+
+
+def read_profile(file_key: str) -> Optional[Dict[str, Any]]:
+    """Read a stored profile (blocking), or None if it has not been built."""
+    try:
+        return json.loads(storage.read_bytes(get_profile_key(file_key)))
+    except FileNotFoundError:
+        return None
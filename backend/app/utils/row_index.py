@@ -0,0 +1,57 @@
+"""Sparse row-offset index for random access into CSV files.
+
+The index is a sidecar object next to the CSV holding the byte offset of
+every Kth data row. Layout (little-endian unsigned 64-bit integers):
+
+    [stride][offset of row 0][offset of row K][offset of row 2K]...
+"""
+import struct
+from pathlib import Path
+from typing import List, Optional, Tuple
+from app.storage import storage
+
+INDEX_SUFFIX = ".idx"
+_ENTRY = struct.Struct("<Q")
+
+
+def get_index_key(file_key: str) -> str:
+    """Get the storage key of the sidecar index for a CSV file."""
+    return file_key + INDEX_SUFFIX
+
+
+def write_row_index(index_path: Path, stride: int, offsets: List[int]) -> None:
+    """Write a row-offset index to disk."""
+    with open(index_path, "wb") as f:
+        f.write(_ENTRY.pack(stride))
+        # Write in batches to avoid building one huge bytes object
+        for start in range(0, len(offsets), 65536):
+            batch = offsets[start:start + 65536]
+            f.write(struct.pack(f"<{len(batch)}Q", *batch))
+
+
+def locate_row(index_key: str, row: int) -> Optional[Tuple[int, int]]:
+    """
+    Find where to start reading to reach a given data row.
+
+    Reads a single index entry, so the cost does not depend on file size.
+
+    Args:
+        index_key: Storage key of the sidecar index
+        row: Zero-based data row number
+
+    Returns:
+        Tuple of (byte offset to seek to, rows to skip after seeking), or
+        None if the index is missing or does not cover the row
+    """
+    try:
+        header = storage.read_range(index_key, 0, _ENTRY.size)
+        if len(header) < _ENTRY.size:
+            return None
+        (stride,) = _ENTRY.unpack(header)
+        entry = storage.read_range(index_key, _ENTRY.size * (1 + row // stride), _ENTRY.size)
+        if len(entry) < _ENTRY.size:
+            return None
+        (offset,) = _ENTRY.unpack(entry)
+        return offset, row % stride
+    except OSError:
+        return None
@@ -0,0 +1,367 @@
+"""Full-text search index of uploaded CSV files.
+
+The index has two levels, so a search never reads the CSV files:
+
+- the database table csv_search_terms maps every term to the blobs
+  containing it (app.models.csv_search_term.CSVSearchTerm), so candidate
+  files are found with one indexed query whatever the corpus size;
+- a sidecar object next to each blob (``<file key>.terms``) maps its terms
+  to the data rows containing them, read with a few small range reads.
+
+Terms are lowercased runs of letters, digits and underscores (at most
+MAX_TERM_LENGTH characters). Both levels store 64-bit hashes of terms
+rather than the terms themselves, which keeps them compact; a hash
+collision can at worst report an extra row. Sidecar layout (little-endian):
+
+    [postings]   per term, its row numbers as unsigned LEB128 varints,
+                 each a difference from the previous one
+    [entries]    (term hash i64, postings offset u64, postings length u32,
+                 row count u32) for each term, sorted by hash
+    [blocks]     hash of the first entry of every BLOCK_SIZE entries (i64)
+    [trailer]    (entries offset u64, entry count u64, block size u32, MAGIC)
+
+A lookup reads the trailer and block list, then one block of entries and
+the postings of each term.
+
+Building a sidecar is an external sort: (term hash, row) pairs are
+collected in runs of RUN_SIZE, each sorted and spilled to a scratch file,
+then merged into the sidecar, so memory stays bounded whatever the file
+size.
+"""
+import bisect
+import csv
+import hashlib
+import heapq
+import io
+import re
+import shutil
+import struct
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Set, Tuple
+from app.storage import storage
+from app.utils.compression import open_stored
+from app.utils.logger import logger
+
+SEARCH_INDEX_SUFFIX = ".terms"
+MAX_TERM_LENGTH = 64
+BLOCK_SIZE = 128
+MAGIC = b"CSVT"
+_TERM_PATTERN = re.compile(r"\w+")
+_ENTRY = struct.Struct("<qQII")
+_BLOCK_KEY = struct.Struct("<q")
+_TRAILER = struct.Struct("<QQI4s")
+_MAX_VARINT_SIZE = 5  # bytes of a row number below 2**32
+RUN_SIZE = 500000  # (term hash, row) pairs sorted in memory at a time
+# A run pair: the term hash shifted to unsigned (same order), then the row
+_PAIR = struct.Struct("<QI")
+_HASH_OFFSET = 1 << 63
+_MERGE_BUFFER_PAIRS = 8192
+_TERM_HASH = struct.Struct("<q")
+
+
+def get_search_index_key(file_key: str) -> str:
+    """Get the storage key of the search index sidecar of a stored file."""
+    return file_key + SEARCH_INDEX_SUFFIX
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into search terms."""
+    return [term[:MAX_TERM_LENGTH] for term in _TERM_PATTERN.findall(text.lower())]
+
+
+@lru_cache(maxsize=65536)
+def term_hash(term: str) -> int:
+    """Get the signed 64-bit hash a term is indexed under."""
+    digest = hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def _append_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _decode_postings(data: bytes, limit: Optional[int] = None) -> List[int]:
+    rows: List[int] = []
+    row = delta = shift = 0
+    for byte in data:
+        if len(rows) == limit:
+            break
+        delta |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        row += delta
+        rows.append(row)
+        delta = shift = 0
+    return rows
+
+
+def _spill_run(runs: BinaryIO, keys: List[int]) -> Tuple[int, int]:
+    """Sort a run of pair keys and append it to the runs file, returning its byte range."""
+    keys.sort()
+    start = runs.tell()
+    for first in range(0, len(keys), _MERGE_BUFFER_PAIRS):
+        runs.write(b"".join(
+            _PAIR.pack(key >> 32, key & 0xFFFFFFFF)
+            for key in keys[first:first + _MERGE_BUFFER_PAIRS]
+        ))
+    return start, runs.tell()
+
+
+def _read_run(runs: BinaryIO, start: int, end: int) -> Iterator[int]:
+    """Yield the pair keys of a spilled run (runs share the file handle)."""
+    position = start
+    while position < end:
+        runs.seek(position)
+        data = runs.read(min(_MERGE_BUFFER_PAIRS * _PAIR.size, end - position))
+        position += len(data)
+        for high, row in _PAIR.iter_unpack(data):
+            yield (high << 32) | row
+
+
+def _write_search_index(
+    index_path: Path,
+    entries_path: Path,
+    terms_path: Path,
+    pairs: Iterator[int]
+) -> int:
+    """
+    Write a search index sidecar from pair keys in sorted order.
+
+    Entries are staged in ``entries_path`` until the postings are written;
+    the term hashes are written to ``terms_path`` in order.
+
+    Returns:
+        Number of terms
+    """
+    block_keys: List[int] = []
+    term_count = 0
+    with open(index_path, "wb") as out, open(entries_path, "w+b") as entries, \
+            open(terms_path, "wb") as terms:
+        postings = bytearray()
+        current = None
+        postings_offset = row_count = previous = 0
+
+        def finish_term() -> None:
+            out.write(postings)
+            entries.write(_ENTRY.pack(
+                current, postings_offset, out.tell() - postings_offset, row_count
+            ))
+            terms.write(_TERM_HASH.pack(current))
+            postings.clear()
+
+        for pair in pairs:
+            key = (pair >> 32) - _HASH_OFFSET
+            row = pair & 0xFFFFFFFF
+            if key != current:
+                if current is not None:
+                    finish_term()
+                if term_count % BLOCK_SIZE == 0:
+                    block_keys.append(key)
+                term_count += 1
+                current = key
+                postings_offset = out.tell()
+                row_count = previous = 0
+            _append_varint(postings, row - previous)
+            previous = row
+            row_count += 1
+            if len(postings) >= 65536:
+                out.write(postings)
+                postings.clear()
+        if current is not None:
+            finish_term()
+
+        entries_offset = out.tell()
+        entries.seek(0)
+        shutil.copyfileobj(entries, out)
+        out.write(b"".join(_BLOCK_KEY.pack(key) for key in block_keys))
+        out.write(_TRAILER.pack(entries_offset, term_count, BLOCK_SIZE, MAGIC))
+    return term_count
+
+
+def _index_pairs(
+    file_key: str,
+    delimiter: str,
+    encoding: str,
+    data_offset: int,
+    compression: Optional[str],
+    runs: BinaryIO
+) -> Iterator[int]:
+    """
+    Collect the (term hash, row) pairs of a stored file as sorted runs.
+
+    Full runs are spilled to ``runs``; the last one stays in memory.
+
+    Returns:
+        The pair keys of all runs, merged in sorted order
+    """
+    ranges: List[Tuple[int, int]] = []
+    keys: List[int] = []
+    with open_stored(file_key, compression, data_offset) as raw:
+        # The BOM, if any, sits before the header, not at data_offset
+        text_encoding = "utf-8" if encoding == "utf-8-sig" else encoding
+        f = io.TextIOWrapper(raw, encoding=text_encoding, newline="")
+        row_number = 0
+        for row in csv.reader(f, delimiter=delimiter):
+            if not row:
+                continue
+            terms: Set[str] = set()
+            for cell in row:
+                terms.update(tokenize(cell))
+            for term in terms:
+                keys.append(((term_hash(term) + _HASH_OFFSET) << 32) | row_number)
+            if len(keys) >= RUN_SIZE:
+                ranges.append(_spill_run(runs, keys))
+                keys = []
+            row_number += 1
+    # The last run is merged from memory
+    keys.sort()
+    runs.flush()
+    return heapq.merge(*(_read_run(runs, start, end) for start, end in ranges), keys)
+
+
+def build_search_index(
+    file_key: str,
+    headers: List[str],
+    delimiter: str,
+    encoding: str,
+    data_offset: int,
+    compression: Optional[str],
+    scratch_path: Path,
+    terms_path: Path
+) -> Optional[int]:
+    """
+    Index the terms of a stored CSV file and store the sidecar (blocking).
+
+    Rows are numbered from zero, skipping blank lines, like the view
+    endpoint's offset. Files that cannot be parsed get no sidecar and are
+    indexed as having no terms.
+
+    Args:
+        scratch_path: Local path to build the sidecar at; further scratch
+            files are made next to it
+        terms_path: Local file receiving the sorted hashes of the file's
+            terms (signed 64-bit little-endian), to record in the
+            database; the caller deletes it
+
+    Returns:
+        Number of terms written to ``terms_path``, or None if indexing
+        failed or the file was deleted meanwhile
+    """
+    runs_path = scratch_path.with_name(scratch_path.name + ".runs")
+    entries_path = scratch_path.with_name(scratch_path.name + ".entries")
+    try:
+        with open(runs_path, "w+b") as runs:
+            try:
+                pairs = _index_pairs(file_key, delimiter, encoding, data_offset, compression, runs)
+            except (csv.Error, UnicodeDecodeError) as e:
+                logger.warning(f"Could not index {file_key} for search: {e}")
+                terms_path.write_bytes(b"")
+                return 0
+            term_count = _write_search_index(scratch_path, entries_path, terms_path, pairs)
+
+        index_key = get_search_index_key(file_key)
+        storage.put_file(index_key, scratch_path)
+        # Deletion removes the file before its sidecars; see build_columnar_copy
+        try:
+            storage.size(file_key)
+        except FileNotFoundError:
+            storage.delete(index_key)
+            return None
+    except Exception as e:
+        logger.error(f"Could not build search index of {file_key}: {e}")
+        return None
+    finally:
+        for path in (scratch_path, runs_path, entries_path):
+            path.unlink(missing_ok=True)
+
+    logger.info(f"Search index built: {index_key} ({term_count} terms)")
+    return term_count
+
+
+def read_term_hashes(terms: BinaryIO, count: int) -> List[int]:
+    """Read up to ``count`` term hashes from a file written by build_search_index (blocking)."""
+    data = terms.read(count * _TERM_HASH.size)
+    return [key for (key,) in _TERM_HASH.iter_unpack(data)]
+
+
+class _SearchIndexReader:
+    """Term lookups in one stored sidecar, each fetched with read_range()."""
+
+    def __init__(self, index_key: str):
+        self.index_key = index_key
+        size = storage.size(index_key)
+        trailer = storage.read_range(index_key, size - _TRAILER.size, _TRAILER.size)
+        self.entries_offset, self.entry_count, self.block_size, magic = _TRAILER.unpack(trailer)
+        if magic != MAGIC:
+            raise ValueError(f"{index_key} is not a search index")
+        block_count = -(-self.entry_count // self.block_size)
+        blocks = storage.read_range(
+            index_key, self.entries_offset + self.entry_count * _ENTRY.size,
+            block_count * _BLOCK_KEY.size
+        )
+        self.block_keys = [first for (first,) in _BLOCK_KEY.iter_unpack(blocks)]
+
+    def entry(self, key: int) -> Optional[Tuple[int, int, int]]:
+        """Get (postings offset, postings length, row count) of a term hash, if present."""
+        block = bisect.bisect_right(self.block_keys, key) - 1
+        if block < 0:
+            return None
+        first_entry = block * self.block_size
+        entries = storage.read_range(
+            self.index_key,
+            self.entries_offset + first_entry * _ENTRY.size,
+            min(self.block_size, self.entry_count - first_entry) * _ENTRY.size,
+        )
+        for entry_key, offset, length, count in _ENTRY.iter_unpack(entries):
+            if entry_key == key:
+                return offset, length, count
+        return None
+
+    def rows(self, offset: int, length: int, limit: Optional[int] = None) -> List[int]:
+        """Decode the postings at an entry's offset, reading only the first ``limit`` rows if given."""
+        if limit is not None:
+            length = min(length, limit * _MAX_VARINT_SIZE)
+        return _decode_postings(storage.read_range(self.index_key, offset, length), limit)
+
+
+def lookup_rows(
+    file_key: str,
+    term_hashes: List[int],
+    max_rows: Optional[int] = None
+) -> Optional[Tuple[int, List[int]]]:
+    """
+    Find the data rows of a stored file containing every given term (blocking).
+
+    A single term's match count is stored with it, so only its first
+    ``max_rows`` rows are read; several terms are intersected in full.
+
+    Returns:
+        Tuple of (number of matching rows, first ``max_rows`` of them in
+        order), or None if the file has no search index
+    """
+    try:
+        reader = _SearchIndexReader(get_search_index_key(file_key))
+    except FileNotFoundError:
+        return None
+    entries = []
+    for key in term_hashes:
+        entry = reader.entry(key)
+        if entry is None:
+            return 0, []
+        entries.append(entry)
+    if len(entries) == 1:
+        offset, length, count = entries[0]
+        return count, reader.rows(offset, length, max_rows)
+    # Rarest term first, so the running intersection stays small
+    entries.sort(key=lambda entry: entry[2])
+    matches: Set[int] = set(reader.rows(*entries[0][:2])) if entries else set()
+    for offset, length, _ in entries[1:]:
+        if not matches:
+            break
+        matches.intersection_update(reader.rows(offset, length))
+    return len(matches), sorted(matches)[:max_rows]
@@ -0,0 +1,389 @@
+"""Read-only SQL over uploaded CSV files, run by an embedded DuckDB engine.
+
+Each worker process keeps one in-memory DuckDB database. Stored files are
+loaded into it as tables on first use and kept between queries, least
+recently used first out, up to settings.sql_table_cache_mb; a table
+larger than that is dropped as soon as no query uses it. Since blobs
+never change, a cached table is never stale. A query runs on its own
+DuckDB connection, where the names the client chose are temporary views
+over the cached tables.
+
+Loading streams the file's cells (from its Parquet copy when it has one)
+into the engine batch by batch, then gives each column a type: BIGINT or
+DOUBLE when every non-empty cell converts without losing its meaning,
+VARCHAR otherwise (zero-padded codes such as 00123 and integers of more
+than 15 digits stay text). Empty cells are NULL; nothing else is. Each
+file is loaded by one query at a time, without blocking queries on other
+tables.
+
+The engine is locked down before any query runs: it cannot read or write
+files, attach databases, install extensions, scan Python objects or
+change its settings. Only single SELECT statements are accepted. Queries
+are interrupted after settings.sql_timeout_seconds, counting the time
+spent loading their tables and streaming their result; memory is capped
+for the engine as a whole (settings.sql_memory_limit_mb, cached tables
+included), and at most settings.sql_max_concurrent_queries queries are
+open at once.
+
+duckdb and pyarrow are optional: without them, SQL queries are disabled.
+"""
+import csv
+import hashlib
+import io
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+from app.core.config import settings
+from app.core.exceptions import BadRequestError
+from app.utils.columnar import iter_text_batches, pyarrow_installed
+from app.utils.csv_query import NUMBER_PATTERN
+from app.utils.logger import logger
+
+# Integers that a 64-bit float holds exactly, without leading zeros
+_INTEGER_REGEX = r"[+-]?(?:0|[1-9][0-9]{0,14})"
+# Zero-padded (codes, not quantities) or too long for a float to hold exactly
+_KEEP_AS_TEXT_REGEX = r"^[+-]?(?:0[0-9]|[0-9]{16})"
+
+
+class TableSource(NamedTuple):
+    """Where to load a queried table from (columns of its CSVFile)."""
+    file_key: str
+    headers: List[str]
+    delimiter: str
+    compression: Optional[str]
+    data_offset: int
+
+
+def _import_duckdb():
+    try:
+        import duckdb
+    except ImportError:
+        return None
+    return duckdb
+
+
+def sql_enabled() -> bool:
+    """Check whether SQL queries are turned on and duckdb and pyarrow are installed."""
+    return settings.sql_queries and _import_duckdb() is not None and pyarrow_installed()
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class _CachedTable:
+    def __init__(self, name: str, size: int, kept: bool):
+        self.name = name
+        self.size = size
+        self.kept = kept  # counted in the cache; other tables are dropped once unpinned
+        self.pins = 0  # open queries using the table; pinned tables are not evicted
+
+
+class _Engine:
+    """The worker's DuckDB database and its cache of loaded tables."""
+
+    def __init__(self):
+        duckdb = _import_duckdb()
+        self.database = duckdb.connect(":memory:", config={
+            "memory_limit": f"{settings.sql_memory_limit_mb}MB",
+            "threads": settings.sql_threads,
+            "temp_directory": str(Path(settings.upload_directory) / "sql_tmp"),
+            "python_enable_replacements": False,
+        })
+        self.database.execute("SET enable_external_access = false")
+        self.database.execute("SET lock_configuration = true")
+        self.tables: "OrderedDict[str, _CachedTable]" = OrderedDict()
+        self.cached_bytes = 0
+        self.lock = threading.Lock()
+        self.loading: Dict[str, threading.Lock] = {}  # per file key, held while loading it
+        self.slots = threading.BoundedSemaphore(settings.sql_max_concurrent_queries)
+        self._names = itertools.count()
+
+    def cursor(self):
+        """Open a new connection to the database."""
+        with self.lock:
+            return self.database.cursor()
+
+    def _pin_cached(self, file_key: str) -> Optional[str]:
+        """Pin a loaded table and return its name, if there is one (lock held)."""
+        table = self.tables.get(file_key)
+        if table is None:
+            return None
+        self.tables.move_to_end(file_key)
+        table.pins += 1
+        return table.name
+
+    def pin(self, source: TableSource, deadline: float) -> str:
+        """
+        Get the name of a stored file's table, loading it if needed, and pin it.
+
+        Raises:
+            TimeoutError: If the table is not loaded by ``deadline``
+                (a time.monotonic() value)
+        """
+        with self.lock:
+            name = self._pin_cached(source.file_key)
+            if name is not None:
+                return name
+            loading = self.loading.setdefault(source.file_key, threading.Lock())
+
+        # Another query may be loading the same file; wait for it rather
+        # than loading it twice
+        if not loading.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            raise TimeoutError
+        try:
+            with self.lock:
+                name = self._pin_cached(source.file_key)
+                if name is not None:
+                    return name
+            table = self._load(source, deadline)
+            with self.lock:
+                self.tables[source.file_key] = table
+                table.pins += 1
+                if table.kept:
+                    self.cached_bytes += table.size
+                self._evict()
+                return table.name
+        finally:
+            with self.lock:
+                if self.loading.get(source.file_key) is loading:
+                    del self.loading[source.file_key]
+            loading.release()
+
+    def unpin(self, file_keys: List[str]) -> None:
+        with self.lock:
+            for file_key in file_keys:
+                table = self.tables.get(file_key)
+                if table is None:
+                    continue
+                table.pins -= 1
+                if not table.pins and not table.kept:
+                    self._drop(file_key)
+            self._evict()
+
+    def _load(self, source: TableSource, deadline: float) -> _CachedTable:
+        """
+        Load a stored file into a new table (without the engine lock).
+
+        Raises:
+            TimeoutError: If loading runs past ``deadline``
+        """
+        name = "file_" + hashlib.sha256(source.file_key.encode("utf-8")).hexdigest()[:16]
+        name += f"_{next(self._names)}"
+        staging = name + "_text"
+        columns = [_quote(header) for header in source.headers]
+        cursor = self.cursor()
+        # DuckDB statements are interrupted at the deadline, batches checked before each
+        timer = threading.Timer(max(0.0, deadline - time.monotonic()), cursor.interrupt)
+        timer.start()
+        size = 0
+        try:
+            cursor.execute(
+                f"CREATE TEMP TABLE {_quote(staging)} ("
+                + ", ".join(f"{column} VARCHAR" for column in columns) + ")"
+            )
+            for batch in iter_text_batches(
+                source.file_key, source.headers, source.delimiter,
+                source.compression, source.data_offset
+            ):
+                if time.monotonic() > deadline:
+                    raise TimeoutError
+                cursor.register("_batch", batch)
+                cursor.execute(f"INSERT INTO {_quote(staging)} SELECT * FROM _batch")
+                cursor.unregister("_batch")
+                size += batch.nbytes
+
+            types = _column_types(cursor, staging, columns)
+            cursor.execute(
+                f"CREATE TABLE {_quote(name)} AS SELECT "
+                + ", ".join(
+                    f"CAST({column} AS {column_type}) AS {column}"
+                    for column, column_type in zip(columns, types)
+                )
+                + f" FROM {_quote(staging)}"
+            )
+        except _import_duckdb().InterruptException:
+            raise TimeoutError
+        finally:
+            timer.cancel()
+            cursor.execute(f"DROP TABLE IF EXISTS {_quote(staging)}")
+            cursor.close()
+
+        kept = size <= settings.sql_table_cache_mb * 1024 * 1024
+        logger.info(
+            f"SQL table loaded: {source.file_key} ({size} bytes"
+            + ("" if kept else ", too large to cache") + ")"
+        )
+        return _CachedTable(name, size, kept)
+
+    def _drop(self, file_key: str) -> None:
+        """Drop a loaded table (lock held)."""
+        table = self.tables.pop(file_key)
+        self.database.execute(f"DROP TABLE {_quote(table.name)}")
+        if table.kept:
+            self.cached_bytes -= table.size
+
+    def _evict(self) -> None:
+        """Drop unpinned tables, least recently used first, while over budget (lock held)."""
+        budget = settings.sql_table_cache_mb * 1024 * 1024
+        for file_key in list(self.tables):
+            if self.cached_bytes <= budget:
+                break
+            if not self.tables[file_key].pins:
+                self._drop(file_key)
+
+
+def _column_types(cursor, table: str, columns: List[str]) -> List[str]:
+    """Pick the type of each text column of a loaded table: BIGINT, DOUBLE or VARCHAR."""
+    if not columns:
+        return []
+    aggregates = []
+    parameters = []
+    for column in columns:
+        aggregates += [
+            f"count({column})",
+            f"count(*) FILTER (WHERE regexp_full_match({column}, ?))",
+            f"count(*) FILTER (WHERE regexp_full_match({column}, ?))",
+            f"count(*) FILTER (WHERE regexp_matches({column}, ?))",
+        ]
+        parameters += [_INTEGER_REGEX, NUMBER_PATTERN, _KEEP_AS_TEXT_REGEX]
+    counts = cursor.execute(
+        f"SELECT {', '.join(aggregates)} FROM {_quote(table)}", parameters
+    ).fetchone()
+    types = []
+    for index in range(0, len(counts), 4):
+        present, integers, numbers, kept_as_text = counts[index:index + 4]
+        if present and integers == present:
+            types.append("BIGINT")
+        elif present and numbers == present and not kept_as_text:
+            types.append("DOUBLE")
+        else:
+            types.append("VARCHAR")
+    return types
+
+
+_engine: Optional[_Engine] = None
+_engine_lock = threading.Lock()
+
+
+def _get_engine() -> _Engine:
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = _Engine()
+        return _engine
+
+
+class SQLResult:
+    """An open query whose rows are fetched as CSV text in chunks (blocking)."""
+
+    def __init__(self, engine: _Engine, cursor, file_keys: List[str], timer: threading.Timer):
+        self._engine = engine
+        self._cursor = cursor
+        self._file_keys = file_keys
+        self._timer = timer
+        self._header_sent = False
+        self.columns = [column[0] for column in cursor.description]
+
+    def fetch_csv(self, max_rows: int = 10000) -> bytes:
+        """
+        Fetch the next rows as CSV bytes, starting with the header row.
+
+        Returns:
+            Encoded rows, or b"" once the result is exhausted
+
+        Raises:
+            BadRequestError: If the query fails or runs out of time
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if not self._header_sent:
+            writer.writerow(self.columns)
+            self._header_sent = True
+        try:
+            writer.writerows(self._cursor.fetchmany(max_rows))
+        except _import_duckdb().Error as e:
+            raise _query_error(e)
+        return buffer.getvalue().encode("utf-8")
+
+    def close(self) -> None:
+        self._timer.cancel()
+        self._cursor.close()
+        self._engine.unpin(self._file_keys)
+        self._engine.slots.release()
+
+
+def _timeout_error() -> BadRequestError:
+    return BadRequestError(
+        f"Query exceeded the time limit of {settings.sql_timeout_seconds:g} seconds"
+    )
+
+
+def _query_error(error: Exception) -> BadRequestError:
+    if isinstance(error, _import_duckdb().InterruptException):
+        return _timeout_error()
+    return BadRequestError(f"Query failed: {error}")
+
+
+def open_sql_query(sql: str, tables: Dict[str, TableSource]) -> SQLResult:
+    """
+    Start a read-only SQL query over stored files (blocking).
+
+    Args:
+        sql: A single SELECT statement
+        tables: Stored file to expose under each table name the query uses
+
+    Returns:
+        The open result; the caller must close it
+
+    Raises:
+        BadRequestError: If the statement is not a single SELECT, or fails
+            to start
+    """
+    duckdb = _import_duckdb()
+    engine = _get_engine()
+    if not engine.slots.acquire(blocking=False):
+        raise BadRequestError("Too many SQL queries are running; try again later")
+
+    deadline = time.monotonic() + settings.sql_timeout_seconds
+    pinned: List[str] = []
+    cursor = engine.cursor()
+    timer = None
+    try:
+        try:
+            statements = cursor.extract_statements(sql)
+        except duckdb.Error as e:
+            raise BadRequestError(f"Invalid SQL: {e}")
+        if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+            raise BadRequestError("Only a single SELECT statement is allowed")
+
+        for name, source in tables.items():
+            try:
+                table_name = engine.pin(source, deadline)
+            except TimeoutError:
+                raise _timeout_error()
+            except Exception as e:
+                logger.warning(f"Could not load {source.file_key} for SQL: {e}")
+                raise BadRequestError(f"Could not load table {name!r}: {e}")
+            pinned.append(source.file_key)
+            cursor.execute(f"CREATE TEMP VIEW {_quote(name)} AS SELECT * FROM {_quote(table_name)}")
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise _timeout_error()
+        timer = threading.Timer(remaining, cursor.interrupt)
+        timer.start()
+        try:
+            cursor.execute(statements[0].query)
+        except duckdb.Error as e:
+            raise _query_error(e)
+    except BaseException:
+        if timer is not None:
+            timer.cancel()
+        cursor.close()
+        engine.unpin(pinned)
+        engine.slots.release()
+        raise
+    return SQLResult(engine, cursor, pinned, timer)
@@ -0,0 +1,145 @@
+"""Pub/sub backends that carry real-time events between worker processes.
+
+Endpoints publish events to the bus instead of broadcasting directly.
+Every worker subscribes to the bus on startup and fans each event out to
+its own WebSocket clients, so an upload handled by one worker reaches
+clients connected to any worker.
+"""
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from app.core.config import settings
+from app.core.database import engine
+from app.utils.logger import logger
+
+EventHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+MAX_NOTIFY_PAYLOAD_BYTES = 7999
+
+
+class EventBus(ABC):
+    """Base class for event bus backends."""
+
+    def __init__(self):
+        self._handler: Optional[EventHandler] = None
+
+    async def start(self, handler: EventHandler) -> None:
+        """Start delivering published events to ``handler``."""
+        self._handler = handler
+
+    async def stop(self) -> None:
+        """Stop delivering events."""
+        self._handler = None
+
+    @abstractmethod
+    async def publish(self, message: Dict[str, Any]) -> None:
+        """Publish an event to every subscribed worker."""
+
+    async def _deliver(self, message: Dict[str, Any]) -> None:
+        if self._handler is None:
+            logger.debug("Event bus not started; dropping event")
+            return
+        try:
+            await self._handler(message)
+        except Exception as e:
+            logger.error(f"Error handling event: {e}")
+
+
+class InMemoryEventBus(EventBus):
+    """Delivers events within this process only (single worker and tests)."""
+
+    async def publish(self, message: Dict[str, Any]) -> None:
+        await self._deliver(message)
+
+
+class PostgresEventBus(EventBus):
+    """Delivers events across processes with PostgreSQL LISTEN/NOTIFY."""
+
+    def __init__(self, channel: str):
+        super().__init__()
+        self.channel = channel
+        self._listener = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _dsn() -> str:
+        # asyncpg takes a plain postgresql:// DSN without the driver suffix
+        url = make_url(settings.async_database_url).set(drivername="postgresql")
+        return url.render_as_string(hide_password=False)
+
+    async def start(self, handler: EventHandler) -> None:
+        await super().start(handler)
+        await self._listen()
+
+    async def _listen(self) -> None:
+        import asyncpg
+
+        self._listener = await asyncpg.connect(self._dsn())
+        self._listener.add_termination_listener(self._on_connection_lost)
+        await self._listener.add_listener(self.channel, self._on_notify)
+        logger.info(f"Listening for events on PostgreSQL channel '{self.channel}'")
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.error(f"Ignoring malformed event payload on channel '{channel}'")
+            return
+        asyncio.create_task(self._deliver(message))
+
+    def _on_connection_lost(self, connection) -> None:
+        if self._handler is not None and self._reconnect_task is None:
+            logger.warning("Event bus listener connection lost; reconnecting")
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = 1.0
+        try:
+            while self._handler is not None:
+                try:
+                    await self._listen()
+                    return
+                except Exception as e:
+                    logger.error(f"Event bus reconnect failed: {e}")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 30.0)
+        finally:
+            self._reconnect_task = None
+
+    async def stop(self) -> None:
+        await super().stop()
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+        if self._listener is not None:
+            await self._listener.close()
+            self._listener = None
+
+    async def publish(self, message: Dict[str, Any]) -> None:
+        payload = json.dumps(message, default=str)
+        if len(payload.encode("utf-8")) > MAX_NOTIFY_PAYLOAD_BYTES:
+            logger.error(f"Event too large for NOTIFY ({len(payload)} bytes); dropped")
+            return
+        # Goes through the regular pool; NOTIFY is delivered on commit
+        async with engine.connect() as conn:
+            await conn.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": self.channel, "payload": payload},
+            )
+            await conn.commit()
+
+
+def create_event_bus() -> EventBus:
+    """Create the event bus backend selected by settings.event_bus_backend."""
+    backend = settings.event_bus_backend
+    if backend == "memory":
+        return InMemoryEventBus()
+    if backend == "postgres":
+        return PostgresEventBus(settings.event_bus_channel)
+    raise ValueError(f"Unknown event_bus_backend {backend!r}; expected 'memory' or 'postgres'")
+
+
+event_bus = create_event_bus()
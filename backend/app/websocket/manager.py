@@ -1,51 +1,344 @@
 """WebSocket connection manager."""
-from typing import List, Dict, Any
+import asyncio
+import json
+import re
+import time
+from datetime import datetime
+from typing import Iterable, List, Dict, Any, Optional, Set
 from fastapi import WebSocket
+from app.core.config import settings
 from app.utils.logger import logger
 
+# What to do when a client's send queue is full
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "disconnect")
+
+# Subscription topics: "csv" (every CSV event), "csv:<action>" (e.g.
+# "csv:uploaded") or "csv:file:<id>" (events for a single file)
+DEFAULT_TOPICS = ("csv",)
+TOPIC_PATTERN = re.compile(r"^csv(:(uploaded|deleted)|:file:\d+)?$")
+
+
+def is_valid_topic(topic: Any) -> bool:
+    """Check whether a client-supplied topic name is one we publish to."""
+    return isinstance(topic, str) and TOPIC_PATTERN.match(topic) is not None
+
+
+# Sent every ws_heartbeat_interval_seconds; clients answer {"type": "pong"}
+PING_MESSAGE = json.dumps({"type": "ping"})
+
+
+def event_topics(message: Dict[str, Any]) -> List[str]:
+    """Get the topics an event is delivered to."""
+    topics = ["csv"]
+    action = message.get("action")
+    if action:
+        topics.append(f"csv:{action}")
+    file_id = message.get("file_id")
+    if file_id is None and isinstance(message.get("file"), dict):
+        file_id = message["file"].get("id")
+    if file_id is not None:
+        topics.append(f"csv:file:{file_id}")
+    return topics
+
+
+class ClientConnection:
+    """A WebSocket client with its own bounded send queue and writer task."""
+
+    def __init__(self, websocket: WebSocket, queue_size: int, user: Optional[str] = None):
+        self.websocket = websocket
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=queue_size)
+        self.writer_task: Optional[asyncio.Task] = None
+        self.user = user
+        self.topics: Set[str] = set()
+        self.connected_at = datetime.utcnow()
+        self.last_seen = time.monotonic()
+        self.client = f"{websocket.client.host}:{websocket.client.port}" if websocket.client else None
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self.dropped_messages = 0
+
+    def start(self, on_error) -> None:
+        """Start draining the send queue in a background task."""
+        self.writer_task = asyncio.create_task(self._drain(on_error))
+
+    def stop(self) -> None:
+        """Stop the writer task."""
+        if self.writer_task is not None and not self.writer_task.done():
+            self.writer_task.cancel()
+
+    async def _drain(self, on_error) -> None:
+        try:
+            while True:
+                text = await self.queue.get()
+                await self.websocket.send_text(text)
+                self.messages_sent += 1
+                self.bytes_sent += len(text)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sending WebSocket message: {e}")
+            on_error(self.websocket)
+
+    def describe(self) -> Dict[str, Any]:
+        """Return metadata and counters for this connection."""
+        return {
+            "user": self.user,
+            "client": self.client,
+            "topics": sorted(self.topics),
+            "connected_at": self.connected_at.isoformat(),
+            "idle_seconds": round(time.monotonic() - self.last_seen, 1),
+            "messages_sent": self.messages_sent,
+            "bytes_sent": self.bytes_sent,
+            "queue_depth": self.queue.qsize(),
+            "dropped_messages": self.dropped_messages,
+        }
+
 
 class ConnectionManager:
     """Manages WebSocket connections for real-time updates."""
-    
+
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        # Keyed by socket so register/unregister are O(1)
+        self.active_connections: Dict[WebSocket, ClientConnection] = {}
+        # topic -> sockets subscribed to it
+        self.subscribers: Dict[str, Set[WebSocket]] = {}
+        # user -> that user's sockets, oldest first
+        self.user_connections: Dict[str, Dict[WebSocket, None]] = {}
+        self.heartbeat_task: Optional[asyncio.Task] = None
+        self.reaped_connections = 0
+        self.evicted_connections = 0
+        self.broadcasts = 0
+        self.broadcast_seconds = 0.0
+        self.dropped_messages = 0
+        self.slow_disconnects = 0
+        self.queue_size = settings.ws_send_queue_size
+        self.slow_consumer_policy = settings.ws_slow_consumer_policy
+        if self.slow_consumer_policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(
+                f"Invalid ws_slow_consumer_policy {self.slow_consumer_policy!r}; "
+                f"expected one of {', '.join(SLOW_CONSUMER_POLICIES)}"
+            )
 
-    async def connect(self, websocket: WebSocket) -> None:
-        """Accept and register a new WebSocket connection."""
-        await websocket.accept()
-        self.active_connections.append(websocket)
+    async def connect(self, websocket: WebSocket, user: Optional[str] = None) -> None:
+        """
+        Register an accepted WebSocket connection.
+
+        The client starts out subscribed to DEFAULT_TOPICS. If the user
+        already has settings.ws_max_connections_per_user connections, the
+        oldest one is closed to make room (a limit of 0 or less means no
+        limit).
+        """
+        if user is not None:
+            sockets = self.user_connections.setdefault(user, {})
+            limit = settings.ws_max_connections_per_user
+            while limit > 0 and len(sockets) >= limit:
+                oldest = next(iter(sockets))
+                logger.warning(f"Closing oldest WebSocket for {user} (connection limit reached)")
+                self.evicted_connections += 1
+                self.disconnect(oldest)
+                asyncio.create_task(self._close(oldest))
+            self.user_connections.setdefault(user, {})[websocket] = None
+
+        connection = ClientConnection(websocket, self.queue_size, user=user)
+        connection.start(self.disconnect)
+        self.active_connections[websocket] = connection
+        self.subscribe(websocket, DEFAULT_TOPICS)
         logger.info(f"WebSocket connected. Total connections: {len(self.active_connections)}")
 
     def disconnect(self, websocket: WebSocket) -> None:
-        """Remove a WebSocket connection."""
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        """Remove a WebSocket connection and stop its writer."""
+        connection = self.active_connections.pop(websocket, None)
+        if connection is not None:
+            self._remove_topics(websocket, connection, list(connection.topics))
+            sockets = self.user_connections.get(connection.user)
+            if sockets is not None:
+                sockets.pop(websocket, None)
+                if not sockets:
+                    del self.user_connections[connection.user]
+            connection.stop()
         logger.info(f"WebSocket disconnected. Total connections: {len(self.active_connections)}")
 
+    def touch(self, websocket: WebSocket) -> None:
+        """Record that a client is still alive (it sent us something)."""
+        connection = self.active_connections.get(websocket)
+        if connection is not None:
+            connection.last_seen = time.monotonic()
+
+    def reap_idle(self) -> int:
+        """
+        Close connections that have not answered a ping in time and ping the rest.
+
+        A client is considered dead once it has been silent for a full
+        heartbeat interval plus the timeout.
+
+        Returns:
+            Number of connections reaped
+        """
+        deadline = time.monotonic() - (
+            settings.ws_heartbeat_interval_seconds + settings.ws_heartbeat_timeout_seconds
+        )
+        reaped = 0
+        for websocket, connection in list(self.active_connections.items()):
+            if connection.last_seen < deadline:
+                self.disconnect(websocket)
+                asyncio.create_task(self._close(websocket, code=1001))
+                reaped += 1
+            else:
+                self._enqueue(connection, PING_MESSAGE)
+        if reaped:
+            self.reaped_connections += reaped
+            logger.info(f"Reaped {reaped} unresponsive WebSocket connections")
+        return reaped
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.ws_heartbeat_interval_seconds)
+            try:
+                self.reap_idle()
+            except Exception as e:
+                logger.error(f"WebSocket heartbeat failed: {e}")
+
+    def start_heartbeat(self) -> None:
+        """Start pinging clients and reaping dead connections in the background."""
+        if self.heartbeat_task is None:
+            self.heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    def stop_heartbeat(self) -> None:
+        """Stop the background heartbeat."""
+        if self.heartbeat_task is not None:
+            self.heartbeat_task.cancel()
+            self.heartbeat_task = None
+
+    def subscribe(self, websocket: WebSocket, topics: Iterable[str]) -> List[str]:
+        """
+        Subscribe a connection to topics.
+
+        Returns:
+            The connection's topics after the change
+        """
+        connection = self.active_connections.get(websocket)
+        if connection is None:
+            return []
+        for topic in topics:
+            if topic in connection.topics:
+                continue
+            if len(connection.topics) >= settings.ws_max_topics_per_client:
+                raise ValueError(
+                    f"At most {settings.ws_max_topics_per_client} topics per connection"
+                )
+            connection.topics.add(topic)
+            self.subscribers.setdefault(topic, set()).add(websocket)
+        return sorted(connection.topics)
+
+    def unsubscribe(self, websocket: WebSocket, topics: Iterable[str]) -> List[str]:
+        """
+        Unsubscribe a connection from topics.
+
+        Returns:
+            The connection's topics after the change
+        """
+        connection = self.active_connections.get(websocket)
+        if connection is None:
+            return []
+        self._remove_topics(websocket, connection, topics)
+        return sorted(connection.topics)
+
+    def _remove_topics(
+        self,
+        websocket: WebSocket,
+        connection: ClientConnection,
+        topics: Iterable[str]
+    ) -> None:
+        for topic in topics:
+            connection.topics.discard(topic)
+            sockets = self.subscribers.get(topic)
+            if sockets is not None:
+                sockets.discard(websocket)
+                if not sockets:
+                    del self.subscribers[topic]
+
+    def _enqueue(self, connection: ClientConnection, text: str) -> None:
+        """Queue a serialized message for one client, applying the slow-consumer policy."""
+        try:
+            connection.queue.put_nowait(text)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        connection.dropped_messages += 1
+        self.dropped_messages += 1
+        if self.slow_consumer_policy == "disconnect":
+            logger.warning("Disconnecting slow WebSocket consumer (send queue full)")
+            self.slow_disconnects += 1
+            self.disconnect(connection.websocket)
+            asyncio.create_task(self._close(connection.websocket))
+        else:
+            # Coalesce: discard the oldest pending message to make room
+            connection.queue.get_nowait()
+            connection.queue.put_nowait(text)
+
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int = 1008) -> None:
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
     async def send_personal_message(self, message: Dict[str, Any], websocket: WebSocket) -> None:
         """Send a message to a specific WebSocket connection."""
-        try:
-            await websocket.send_json(message)
-        except Exception as e:
-            logger.error(f"Error sending personal message: {e}")
-            self.disconnect(websocket)
+        connection = self.active_connections.get(websocket)
+        if connection is not None:
+            self._enqueue(connection, json.dumps(message, default=str))
 
     async def broadcast(self, message: Dict[str, Any]) -> None:
-        """Broadcast a message to all connected WebSocket clients."""
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                logger.error(f"Error broadcasting message: {e}")
-                disconnected.append(connection)
-        
-        # Remove broken connections
-        for connection in disconnected:
-            self.disconnect(connection)
-        
-        logger.debug(f"Broadcasted message to {len(self.active_connections)} connections")
+        """
+        Broadcast a message to the clients subscribed to any of its topics.
 
+        The message is serialized once and queued for each recipient;
+        delivery happens in the per-client writer tasks, so this returns
+        without waiting on any socket. Nothing is serialized when no client
+        is interested.
+        """
+        started = time.perf_counter()
+        recipients: Set[WebSocket] = set()
+        for topic in event_topics(message):
+            recipients.update(self.subscribers.get(topic, ()))
+        if recipients:
+            text = json.dumps(message, default=str)
+            for websocket in recipients:
+                connection = self.active_connections.get(websocket)
+                if connection is not None:
+                    self._enqueue(connection, text)
+        self.broadcasts += 1
+        self.broadcast_seconds += time.perf_counter() - started
 
-manager = ConnectionManager()
+        logger.debug(f"Queued broadcast for {len(recipients)} connections")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return aggregate fan-out counters for this worker."""
+        connections = self.active_connections.values()
+        return {
+            "connections": len(self.active_connections),
+            "topics": len(self.subscribers),
+            "broadcasts": self.broadcasts,
+            "avg_broadcast_ms": (
+                self.broadcast_seconds / self.broadcasts * 1000 if self.broadcasts else 0.0
+            ),
+            "queued_messages": sum(c.queue.qsize() for c in connections),
+            "dropped_messages": self.dropped_messages,
+            "slow_disconnects": self.slow_disconnects,
+            "reaped_connections": self.reaped_connections,
+            "evicted_connections": self.evicted_connections,
+        }
 
+    def describe_connections(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Describe connections, most backed-up first, to help spot slow clients."""
+        ranked = sorted(
+            self.active_connections.values(),
+            key=lambda c: (c.queue.qsize(), c.dropped_messages),
+            reverse=True,
+        )
+        return [c.describe() for c in ranked[:limit]]
+
+
+manager = ConnectionManager()
@@ -0,0 +1,51 @@
+"""Shared helpers for benchmarks that drive a running API server (requires httpx)."""
+import argparse
+import asyncio
+import time
+from typing import List
+
+import httpx
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the base URL and login options shared by HTTP benchmarks."""
+    parser.add_argument("--base-url", default="http://localhost:8000", help="API server URL")
+    parser.add_argument("--email", default="admin@example.com", help="Login email")
+    parser.add_argument("--password", default="admin123", help="Login password")
+
+
+async def login(client: httpx.AsyncClient, email: str, password: str) -> str:
+    """Log in and return a bearer token."""
+    response = await client.post(
+        "/api/v1/auth/login", json={"email": email, "password": password}
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def probe_health(client: httpx.AsyncClient, stop: asyncio.Event, samples: List[float]) -> None:
+    """Hit /health every 10 ms until stopped, recording latencies."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get("/health")
+        response.raise_for_status()
+        samples.append(time.perf_counter() - start)
+        await asyncio.sleep(0.01)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Return the pct-th percentile of a list of samples (nearest rank)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(label: str, samples: List[float]) -> str:
+    """Format count and p50/p99/max latencies (milliseconds) for a list of seconds."""
+    ms = [s * 1000 for s in samples]
+    return (
+        f"{label:<24} n={len(ms):<6} p50={percentile(ms, 50):8.2f}ms "
+        f"p99={percentile(ms, 99):8.2f}ms max={max(ms, default=0):8.2f}ms"
+    )
@@ -0,0 +1,75 @@
+"""
+Authenticated-endpoint throughput benchmark.
+
+Hammers GET /api/v1/auth/me with one reused token from a number of
+concurrent clients and reports requests/sec and latency percentiles. Run
+it once against a server with the token cache enabled (the default) and
+once against a server started with TOKEN_CACHE_SIZE=0 to compare; the
+server's cache counters are printed to confirm which mode was measured.
+
+Requires httpx. Usage (server running, admin seeded):
+    python benchmarks/bench_auth.py --concurrency 32 --duration 15 --label cached
+    TOKEN_CACHE_SIZE=0 uvicorn app.main:app   # restart server, then:
+    python benchmarks/bench_auth.py --concurrency 32 --duration 15 --label uncached
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import List
+
+import httpx
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _http import add_server_arguments, login, summarize
+
+
+async def client_loop(
+    client: httpx.AsyncClient, headers: dict, deadline: float, samples: List[float]
+) -> None:
+    """Issue requests back to back until the deadline."""
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get("/api/v1/auth/me", headers=headers)
+        response.raise_for_status()
+        samples.append(time.perf_counter() - start)
+
+
+async def run(args: argparse.Namespace) -> None:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30, limits=limits) as client:
+        token = await login(client, args.email, args.password)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        # Warm up connections and caches
+        await client.get("/api/v1/auth/me", headers=headers)
+
+        samples: List[float] = []
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*[
+            client_loop(client, headers, deadline, samples) for _ in range(args.concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+
+        metrics = (await client.get("/api/v1/metrics/", headers=headers)).json()
+
+    print(f"[{args.label}] {len(samples) / elapsed:,.0f} requests/sec over {elapsed:.1f}s")
+    print(summarize(f"[{args.label}] /auth/me", samples))
+    print(f"server token_cache: {metrics.get('token_cache')}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    add_server_arguments(parser)
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds to run")
+    parser.add_argument("--label", default="run", help="Label for this run in the output")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
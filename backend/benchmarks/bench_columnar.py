@@ -0,0 +1,118 @@
+"""
+Latency/memory benchmark for filtered and sorted views over columnar copies.
+
+Generates a large CSV file, builds its Parquet copy, then answers the same
+filter/sort queries through the CSV text path (query_csv_rows) and the
+columnar path (query_columnar_rows), checking that both return the same
+rows. Each mode runs in a fresh subprocess so peak RSS is measured in
+isolation. Requires pyarrow.
+
+Usage (from the backend directory):
+    python benchmarks/bench_columnar.py --size-mb 300
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.utils.columnar import build_columnar_copy, query_columnar_rows
+from app.utils.csv_parser import scan_csv_file
+from app.utils.csv_query import RowQuery, query_csv_rows
+from bench_csv_parser import generate_csv
+
+
+QUERIES = [
+    ("amount >= 1000000", RowQuery(filters=[("amount", "gte", "1000000")])),
+    ("name contains 99", RowQuery(columns=["id", "name"], filters=[("name", "contains", "99")])),
+    ("sort -amount", RowQuery(sort=[("amount", True)])),
+]
+
+
+def _run(mode: str, file_key: str, metadata: dict, max_rows: int, queue) -> None:
+    timings = []
+    results = []
+    for _, query in QUERIES:
+        start = time.perf_counter()
+        if mode == "columnar":
+            result = query_columnar_rows(file_key, query, max_rows=max_rows)
+        else:
+            result = query_csv_rows(
+                file_key,
+                headers=metadata["headers"],
+                delimiter=metadata["delimiter"],
+                encoding=metadata["encoding"],
+                data_offset=metadata["data_offset"],
+                query=query,
+                max_rows=max_rows,
+            )
+        timings.append(time.perf_counter() - start)
+        results.append(result)
+    # ru_maxrss is reported in kilobytes on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    queue.put((timings, peak_mb, results))
+
+
+def measure(mode: str, file_key: str, metadata: dict, max_rows: int) -> tuple:
+    """Run every query in a subprocess and return (seconds per query, peak MB, results)."""
+    queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(
+        target=_run, args=(mode, file_key, metadata, max_rows, queue)
+    )
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-mb", type=int, default=300, help="Size of the generated CSV")
+    parser.add_argument("--max-rows", type=int, default=100, help="Rows per page")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file_path = Path(tmp) / "bench.csv"
+        print(f"Generating ~{args.size_mb} MB CSV...")
+        generate_csv(file_path, args.size_mb)
+        # Absolute, so the local storage backend reads the file in place
+        file_key = str(file_path.resolve())
+        metadata = scan_csv_file(file_path, index_stride=settings.csv_index_stride)
+
+        start = time.perf_counter()
+        built = build_columnar_copy(
+            file_key,
+            headers=metadata["headers"],
+            delimiter=metadata["delimiter"],
+            compression=None,
+            data_offset=metadata["data_offset"],
+            row_count=metadata["row_count"],
+            scratch_path=Path(tmp) / "bench.parquet.part",
+        )
+        if not built:
+            sys.exit("Could not build the columnar copy (is pyarrow installed?)")
+        print(
+            f"Rows: {metadata['row_count']}, columnar copy built in "
+            f"{time.perf_counter() - start:.2f}s "
+            f"({(file_path.stat().st_size) / (1024 * 1024):.1f} MB CSV -> "
+            f"{Path(file_key + '.parquet').stat().st_size / (1024 * 1024):.1f} MB Parquet)"
+        )
+
+        print(f"{'mode':<10} " + " ".join(f"{label:>20}" for label, _ in QUERIES) + f" {'peak MB':>10}")
+        results = {}
+        for mode in ("text", "columnar"):
+            timings, peak_mb, results[mode] = measure(mode, file_key, metadata, args.max_rows)
+            print(f"{mode:<10} " + " ".join(f"{t:>19.2f}s" for t in timings) + f" {peak_mb:>10.1f}")
+        if results["text"] != results["columnar"]:
+            sys.exit("The text and columnar paths returned different rows")
+
+
+if __name__ == "__main__":
+    main()
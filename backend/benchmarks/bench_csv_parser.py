@@ -0,0 +1,108 @@
+"""
+Memory/latency benchmark for parse_csv_file.
+
+Generates a large CSV file and compares the streaming parser against the
+previous implementation, which materialized every row with list(reader).
+Each run happens in a fresh subprocess so peak RSS is measured in isolation.
+
+Usage (from the backend directory):
+    python benchmarks/bench_csv_parser.py --size-mb 300 --max-rows 100
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.csv_parser import parse_csv_file
+
+
+def generate_csv(path: Path, size_mb: int) -> int:
+    """Write a CSV file of roughly ``size_mb`` megabytes and return its row count."""
+    target = size_mb * 1024 * 1024
+    rows = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "email", "city", "amount", "notes"])
+        while f.tell() < target:
+            for _ in range(10000):
+                writer.writerow([
+                    rows,
+                    f"user_{rows}",
+                    f"user_{rows}@example.com",
+                    "Kathmandu, Nepal",
+                    f"{rows * 1.5:.2f}",
+                    "lorem ipsum dolor sit amet",
+                ])
+                rows += 1
+    return rows
+
+
+def legacy_parse(file_path: Path, max_rows: int) -> dict:
+    """The pre-streaming implementation, kept here as the baseline."""
+    with open(file_path, "r", encoding="utf-8") as f:
+        sample = f.read(1024)
+        f.seek(0)
+        delimiter = csv.Sniffer().sniff(sample).delimiter
+        rows = list(csv.DictReader(f, delimiter=delimiter))
+        return {
+            "headers": list(rows[0].keys()) if rows else [],
+            "rows": rows[:max_rows],
+            "total_rows": len(rows),
+        }
+
+
+def _run(mode: str, file_path: str, max_rows: int, queue) -> None:
+    parse = legacy_parse if mode == "legacy" else parse_csv_file
+    start = time.perf_counter()
+    # Absolute, so the local storage backend reads the file in place
+    result = parse(Path(file_path).resolve(), max_rows)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is reported in kilobytes on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    queue.put((elapsed, peak_mb, result["total_rows"], len(result["rows"])))
+
+
+def measure(mode: str, file_path: Path, max_rows: int) -> tuple:
+    """Run one parse in a subprocess and return (seconds, peak MB, total, shown)."""
+    queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=_run, args=(mode, str(file_path), max_rows, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-mb", type=int, default=300, help="Size of the generated CSV")
+    parser.add_argument("--max-rows", type=int, default=100, help="Rows returned per view")
+    parser.add_argument("--file", type=Path, help="Use an existing CSV instead of generating one")
+    parser.add_argument("--skip-legacy", action="store_true", help="Only run the streaming parser")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file_path = args.file
+        if file_path is None:
+            file_path = Path(tmp) / "bench.csv"
+            print(f"Generating ~{args.size_mb} MB CSV...")
+            generate_csv(file_path, args.size_mb)
+        size_mb = file_path.stat().st_size / (1024 * 1024)
+        print(f"File: {file_path} ({size_mb:.1f} MB), max_rows={args.max_rows}")
+
+        modes = ["streaming"] if args.skip_legacy else ["streaming", "legacy"]
+        print(f"{'mode':<10} {'seconds':>10} {'peak MB':>10} {'total_rows':>12} {'shown':>6}")
+        for mode in modes:
+            elapsed, peak_mb, total, shown = measure(mode, file_path, args.max_rows)
+            print(f"{mode:<10} {elapsed:>10.2f} {peak_mb:>10.1f} {total:>12} {shown:>6}")
+
+
+if __name__ == "__main__":
+    main()
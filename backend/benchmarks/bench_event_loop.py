@@ -0,0 +1,88 @@
+"""
+Event-loop responsiveness benchmark.
+
+Keeps a number of large /csv/{id}/view requests in flight against a
+running server while probing /health, and reports /health latency
+percentiles with and without the view load. If blocking work runs on the
+event loop, /health p99 climbs to the duration of a view.
+
+Requires httpx. Usage (server running, admin seeded, a large CSV uploaded):
+    python benchmarks/bench_event_loop.py --file-id 1 --concurrency 16
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from typing import List
+
+import httpx
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _http import add_server_arguments, login, probe_health, summarize
+
+
+async def view_load(
+    client: httpx.AsyncClient,
+    token: str,
+    file_id: int,
+    max_offset: int,
+    stop: asyncio.Event,
+    samples: List[float],
+) -> None:
+    """Issue 1000-row view requests at random offsets until stopped."""
+    headers = {"Authorization": f"Bearer {token}"}
+    while not stop.is_set():
+        params = {"max_rows": 1000, "offset": random.randint(0, max_offset)}
+        start = time.perf_counter()
+        response = await client.get(f"/api/v1/csv/{file_id}/view", params=params, headers=headers)
+        response.raise_for_status()
+        samples.append(time.perf_counter() - start)
+
+
+async def run(args: argparse.Namespace) -> None:
+    limits = httpx.Limits(max_connections=args.concurrency + 4)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120, limits=limits) as client:
+        token = await login(client, args.email, args.password)
+
+        # Baseline: /health with no other load
+        stop = asyncio.Event()
+        idle: List[float] = []
+        prober = asyncio.create_task(probe_health(client, stop, idle))
+        await asyncio.sleep(args.duration / 2)
+        stop.set()
+        await prober
+
+        # Under load: /health while views are in flight
+        stop = asyncio.Event()
+        loaded: List[float] = []
+        views: List[float] = []
+        tasks = [
+            asyncio.create_task(view_load(client, token, args.file_id, args.max_offset, stop, views))
+            for _ in range(args.concurrency)
+        ]
+        prober = asyncio.create_task(probe_health(client, stop, loaded))
+        await asyncio.sleep(args.duration)
+        stop.set()
+        await asyncio.gather(prober, *tasks)
+
+    print(summarize("/health (idle)", idle))
+    print(summarize(f"/health ({args.concurrency} views)", loaded))
+    print(summarize("/csv/{id}/view", views))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    add_server_arguments(parser)
+    parser.add_argument("--file-id", type=int, required=True, help="ID of a large uploaded CSV")
+    parser.add_argument("--max-offset", type=int, default=0, help="Upper bound for random view offsets")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent view requests")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds to run under load")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Login storm load test.
+
+Runs a number of concurrent clients that log in back to back, while
+probing /health, and reports login throughput and latency alongside
+/health latency with and without the storm. With bcrypt on the event
+loop, /health p99 tracks the bcrypt cost times the queue depth; with the
+password pool it should stay near its idle value.
+
+Requires httpx. Usage (server running, admin seeded):
+    python benchmarks/bench_login_storm.py --concurrency 32 --duration 15
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import List
+
+import httpx
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _http import add_server_arguments, probe_health, summarize
+
+
+async def login_loop(
+    client: httpx.AsyncClient, credentials: dict, stop: asyncio.Event, samples: List[float]
+) -> None:
+    """Log in back to back until stopped, recording latencies."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.post("/api/v1/auth/login", json=credentials)
+        response.raise_for_status()
+        samples.append(time.perf_counter() - start)
+
+
+async def run(args: argparse.Namespace) -> None:
+    credentials = {"email": args.email, "password": args.password}
+    limits = httpx.Limits(max_connections=args.concurrency + 4)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120, limits=limits) as client:
+        # Baseline: /health with no logins in flight
+        stop = asyncio.Event()
+        idle: List[float] = []
+        prober = asyncio.create_task(probe_health(client, stop, idle))
+        await asyncio.sleep(min(5.0, args.duration))
+        stop.set()
+        await prober
+
+        # Storm: concurrent logins while probing /health
+        stop = asyncio.Event()
+        health: List[float] = []
+        logins: List[float] = []
+        tasks = [
+            asyncio.create_task(login_loop(client, credentials, stop, logins))
+            for _ in range(args.concurrency)
+        ]
+        prober = asyncio.create_task(probe_health(client, stop, health))
+        started = time.perf_counter()
+        await asyncio.sleep(args.duration)
+        stop.set()
+        await asyncio.gather(prober, *tasks)
+        elapsed = time.perf_counter() - started
+
+    print(f"logins/sec: {len(logins) / elapsed:,.1f} ({args.concurrency} concurrent clients)")
+    print(summarize("/auth/login", logins))
+    print(summarize("/health (idle)", idle))
+    print(summarize("/health (login storm)", health))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    add_server_arguments(parser)
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent login clients")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds to run the storm")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Latency benchmark for search index lookups.
+
+Generates a large CSV file, builds its search index sidecar, then times
+lookups of rare terms (one row), common terms (every row) and term pairs
+against the sidecar, the per-file part of a search. The database part is
+a primary-key lookup in csv_search_terms and is not measured here.
+
+Usage (from the backend directory):
+    python benchmarks/bench_search.py --size-mb 50 --lookups 200
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.csv_parser import scan_csv_file
+from app.utils.search_index import build_search_index, lookup_rows, term_hash
+from bench_csv_parser import generate_csv
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-mb", type=int, default=50, help="Size of the generated CSV")
+    parser.add_argument("--lookups", type=int, default=200, help="Lookups per query kind")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file_path = Path(tmp) / "bench.csv"
+        print(f"Generating ~{args.size_mb} MB CSV...")
+        generate_csv(file_path, args.size_mb)
+        # Absolute, so the local storage backend reads the file in place
+        file_key = str(file_path.resolve())
+        metadata = scan_csv_file(file_path)
+
+        start = time.perf_counter()
+        term_count = build_search_index(
+            file_key,
+            headers=metadata["headers"],
+            delimiter=metadata["delimiter"],
+            encoding=metadata["encoding"],
+            data_offset=metadata["data_offset"],
+            compression=None,
+            scratch_path=Path(tmp) / "bench.terms.part",
+            terms_path=Path(tmp) / "bench.hashes",
+        )
+        if term_count is None:
+            sys.exit("Could not build the search index")
+        print(
+            f"Rows: {metadata['row_count']}, {term_count} terms indexed in "
+            f"{time.perf_counter() - start:.2f}s "
+            f"({Path(file_key + '.terms').stat().st_size / (1024 * 1024):.1f} MB sidecar)"
+        )
+
+        rng = random.Random(args.seed)
+        rows = metadata["row_count"]
+        queries = {
+            "rare": lambda: [f"user_{rng.randrange(rows)}"],
+            "common": lambda: ["kathmandu"],
+            "rare+common": lambda: [f"user_{rng.randrange(rows)}", "nepal"],
+        }
+        print(f"{'query':<12} {'ms/lookup':>10} {'matches':>10}")
+        for name, make_terms in queries.items():
+            start = time.perf_counter()
+            for _ in range(args.lookups):
+                matches, _ = lookup_rows(
+                    file_key, [term_hash(term) for term in make_terms()], max_rows=20
+                )
+            elapsed = time.perf_counter() - start
+            print(f"{name:<12} {elapsed / args.lookups * 1000:>10.2f} {matches:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Script to add files stored before search indexing existed to the search index.
+Run this once after applying the migration that adds csv_search_terms.
+"""
+import asyncio
+from sqlalchemy import select
+from app.core.database import AsyncSessionLocal, engine
+from app.models.csv_blob import CSVBlob
+from app.models.csv_file import CSVFile
+from app.services.search_service import SearchService
+
+async def reindex_search():
+    """Index every blob not yet in the search index, one at a time."""
+    db = AsyncSessionLocal()
+    try:
+        result = await db.execute(
+            select(CSVFile)
+            .join(CSVBlob, CSVFile.blob_id == CSVBlob.id)
+            .where(CSVBlob.search_indexed_at.is_(None), CSVFile.row_count.isnot(None))
+            .order_by(CSVFile.blob_id, CSVFile.id)
+        )
+        # One file per blob supplies the metadata recorded at upload
+        pending = {}
+        for csv_file in result.scalars():
+            pending.setdefault(csv_file.blob_id, csv_file)
+    finally:
+        await db.close()
+    
+    print(f"Indexing {len(pending)} stored file(s)...")
+    indexed = 0
+    for csv_file in pending.values():
+        if await SearchService.index_blob(csv_file):
+            indexed += 1
+    print(f"Indexed {indexed} of {len(pending)} stored file(s).")
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(reindex_search())
@@ -16,9 +16,13 @@ export const API_ENDPOINTS = {
   },
   CSV: {
     LIST: '/api/v1/csv/list',
+    SEARCH: '/api/v1/csv/search',
+    QUERY: '/api/v1/csv/query',
     UPLOAD: '/api/v1/csv/upload',
     VIEW: (id: number) => `/api/v1/csv/${id}/view`,
     DOWNLOAD: (id: number) => `/api/v1/csv/${id}/download`,
+    DOWNLOAD_URL: (id: number) => `/api/v1/csv/${id}/download-url`,
+    STATS: (id: number) => `/api/v1/csv/${id}/stats`,
     DELETE: (id: number) => `/api/v1/csv/${id}`,
   },
   USERS: {
@@ -200,7 +200,7 @@ export default function CSVViewPage() {
               paginatedRows.map((row, idx) => (
                 <Table.Tr key={startIndex + idx}>
                   {csvData.headers.map((header) => (
-                    <Table.Td key={header}>{row[header] || ''}</Table.Td>
+                    <Table.Td key={header}>{row[header] == null ? '' : String(row[header])}</Table.Td>
                   ))}
                 </Table.Tr>
               ))
@@ -3,7 +3,7 @@
  */
 import { apiClient } from '../../config/api'
 import { API_ENDPOINTS } from '../../config/constants'
-import { CSVFile, CSVViewData } from '../../types'
+import { CSVFile, CSVSearchResults, CSVStats, CSVViewData, CSVViewQuery } from '../../types'
 import { ApiError } from '../../types/api'
 
 export class CSVService {
@@ -22,14 +22,27 @@ export class CSVService {
   }
 
   /**
-   * View CSV file contents
+   * View CSV file contents, optionally projected, filtered and sorted on the server
    */
-  static async view(fileId: number, maxRows = 100): Promise<CSVViewData> {
+  static async view(
+    fileId: number,
+    maxRows = 100,
+    offset = 0,
+    query: CSVViewQuery = {}
+  ): Promise<CSVViewData> {
     try {
       const response = await apiClient.get<CSVViewData>(
         API_ENDPOINTS.CSV.VIEW(fileId),
         {
-          params: { max_rows: maxRows },
+          params: {
+            max_rows: maxRows,
+            offset,
+            columns: query.columns,
+            filter: query.filters,
+            sort: query.sort,
+          },
+          // Repeat list parameters (columns=a&columns=b), as FastAPI expects
+          paramsSerializer: { indexes: null },
         }
       )
       return response.data
@@ -38,6 +51,49 @@ export class CSVService {
     }
   }
 
+  /**
+   * Get per-column statistics (status is 'pending' until computed)
+   */
+  static async stats(fileId: number): Promise<CSVStats> {
+    try {
+      const response = await apiClient.get<CSVStats>(API_ENDPOINTS.CSV.STATS(fileId))
+      return response.data
+    } catch (error: unknown) {
+      throw this.handleError(error)
+    }
+  }
+
+  /**
+   * Find files and rows containing every word of a query
+   */
+  static async search(query: string, limit: number = 20): Promise<CSVSearchResults> {
+    try {
+      const response = await apiClient.get<CSVSearchResults>(API_ENDPOINTS.CSV.SEARCH, {
+        params: { q: query, limit },
+      })
+      return response.data
+    } catch (error: unknown) {
+      throw this.handleError(error)
+    }
+  }
+
+  /**
+   * Run a read-only SQL query; tables maps each table name used in the query to a file id.
+   * Returns the result as CSV text.
+   */
+  static async query(sql: string, tables: Record<string, number>): Promise<string> {
+    try {
+      const response = await apiClient.post<string>(
+        API_ENDPOINTS.CSV.QUERY,
+        { sql, tables },
+        { responseType: 'text' }
+      )
+      return response.data
+    } catch (error: unknown) {
+      throw this.handleError(error)
+    }
+  }
+
   /**
    * Upload CSV file
    */
@@ -63,9 +119,20 @@ export class CSVService {
 
   /**
    * Download CSV file
+   *
+   * Uses a presigned object-storage URL when the backend offers one, so the
+   * file does not pass through the API; otherwise downloads through the API.
    */
   static async download(fileId: number, filename: string): Promise<void> {
     try {
+      const direct = await apiClient.get<{ url: string | null }>(
+        API_ENDPOINTS.CSV.DOWNLOAD_URL(fileId)
+      )
+      if (direct.data.url) {
+        window.location.assign(direct.data.url)
+        return
+      }
+
       const response = await apiClient.get(API_ENDPOINTS.CSV.DOWNLOAD(fileId), {
         responseType: 'blob',
       })
@@ -42,6 +42,11 @@ export class WebSocketService {
       this.ws.onmessage = (event) => {
         try {
           const data: WebSocketMessage = JSON.parse(event.data)
+          // Answer server heartbeats so the connection is not reaped
+          if (data.type === 'ping') {
+            this.ws?.send(JSON.stringify({ type: 'pong' }))
+            return
+          }
           this.messageHandlers.forEach((handler) => handler(data))
         } catch (error) {
           console.error('Error parsing WebSocket message:', error)
@@ -117,6 +122,15 @@ export class WebSocketService {
     }
   }
 
+  /**
+   * Change which server-side topics this connection receives
+   */
+  setSubscription(type: 'subscribe' | 'unsubscribe', topics: string[]): void {
+    if (this.ws?.readyState === WebSocket.OPEN) {
+      this.ws.send(JSON.stringify({ type, topics }))
+    }
+  }
+
   /**
    * Attempt to reconnect with exponential backoff
    */
@@ -17,14 +17,64 @@ export interface CSVFile {
   uploader_id: number
   uploader_username: string
   uploaded_at: string
+  row_count?: number | null
+}
+
+/** Cell text as uploaded; null for a cell missing from a short row */
+export type CSVCellValue = string | null
+
+/** Server-side projection, filters and sort for a CSV view */
+export interface CSVViewQuery {
+  columns?: string[]
+  /** Predicates as column:operator:value (eq, ne, lt, lte, gt, gte, contains) */
+  filters?: string[]
+  /** Sort columns; prefix with - for descending */
+  sort?: string[]
 }
 
 export interface CSVViewData {
   filename: string
   headers: string[]
-  rows: Record<string, string>[]
+  rows: Record<string, CSVCellValue>[]
   total_rows: number
   displayed_rows: number
+  offset: number
+}
+
+export interface CSVColumnStats {
+  name: string
+  type: 'integer' | 'float' | 'boolean' | 'string' | 'empty'
+  count: number
+  null_count: number
+  distinct_estimate: number
+  min: string | number | null
+  max: string | number | null
+  mean: number | null
+  quantiles: Record<string, number> | null
+}
+
+export interface CSVStats {
+  file_id: number
+  filename: string
+  status: 'ready' | 'pending' | 'failed' | 'unavailable'
+  row_count: number | null
+  computed_at: string | null
+  columns: CSVColumnStats[]
+  error: string | null
+}
+
+export interface CSVSearchResult {
+  file_id: number
+  filename: string
+  uploaded_at: string
+  match_count: number
+  rows: number[]
+}
+
+export interface CSVSearchResults {
+  query: string
+  terms: string[]
+  results: CSVSearchResult[]
 }
 
 export interface WebSocketMessage {